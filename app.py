@@ -3,42 +3,59 @@
 import gradio as gr
 import json
 import os
-from src.intent_parser import parse_intent
-from src.menu_data import MENU
+import threading
+import time
+from src.intent_parser import get_coalescing_stats
+from src.tenants import DEFAULT_TENANT, TenantError, get_tenant_artifacts, get_tenant_stats, list_tenants
+from src.circuit_breaker import get_breaker_states
+from src.llm_client import probe_model
+from src.llm_backends import get_router, GROQ_MODELS
+from src.kitchen_scheduler import KitchenScheduler, format_station_plan
+from src.speculation import get_speculator, format_preview
+
+# Start the LLM call while the customer is still typing. Off by default: it
+# spends extra LLM calls per order (set SPECULATIVE_LLM=1 to enable).
+SPECULATE_LLM = os.environ.get("SPECULATIVE_LLM", "0") == "1"
+
+# Recent confirmed tickets per restaurant, planned across stations for the chef view.
+# Ticket numbers come from a running count so they stay unique once old tickets
+# leave the window. Gradio runs handlers concurrently, so both go under the lock.
+KITCHEN_ORDERS = {}
+KITCHEN_TICKET_COUNT = {}
+KITCHEN_WINDOW = 20
+KITCHEN_LOCK = threading.Lock()
+APP_START = time.time()
 
 # --- HELPER FUNCTIONS ---
 
-def flatten_menu_for_display():
-    """Formats menu for the UI Accordion."""
-    display_text = ""
-    for category, items in MENU.items():
-        display_text += f"\n### {category}\n"
-        for item in items:
-            tags = ", ".join(item['tags'])
-            display_text += f"- **{item['name']}** (₹{item['price']}): {item['description']} _[{tags}]_\n"
-    return display_text
-
-def format_chef_ticket(json_ticket):
-    """Converts the JSON output into a nice HTML/Markdown ticket for the Chef."""
-    if not json_ticket:
+def flatten_menu_for_display(tenant_id=DEFAULT_TENANT):
+    """Formats the restaurant's menu for the UI Accordion (cached per tenant)."""
+    try:
+        return get_tenant_artifacts(tenant_id).menu_markdown
+    except TenantError as e:
+        return f"⚠️ Menu unavailable for this restaurant: {e}"
+
+def format_chef_ticket(ticket):
+    """Converts a Ticket into a nice HTML/Markdown ticket for the Chef."""
+    if not ticket:
         return "No Data"
         
     items_html = "<ul>"
-    for item in json_ticket.get('ordered_items', []):
-        items_html += f"<li><b>{item['quantity']}x {item['name']}</b><br><i>Note: {item.get('notes', '-')}</i></li>"
+    for item in ticket.ordered_items:
+        items_html += f"<li><b>{item.quantity}x {item.name}</b><br><i>Note: {item.notes or '-'}</i></li>"
     items_html += "</ul>"
     
-    constraints = ", ".join(json_ticket.get('dietary_constraints', []))
+    constraints = ", ".join(ticket.dietary_constraints)
     
-    tp = json_ticket.get('taste_profile', {})
+    tp = ticket.taste_profile
     taste_html = f"""
-    <b>Spice:</b> {tp.get('spice_level')}<br>
-    <b>Oil:</b> {tp.get('oil_level')}<br>
-    <b>Salt:</b> {tp.get('salt_level')}<br>
+    <b>Spice:</b> {tp.spice_level}<br>
+    <b>Oil:</b> {tp.oil_level}<br>
+    <b>Salt:</b> {tp.salt_level}<br>
     """
     
-    alert_style = "background-color: #ffebee; border: 1px solid red; padding: 10px;" if json_ticket.get('confirm_with_customer') else ""
-    conflict_style = "background-color: #fff3cd; border: 1px solid orange; padding: 10px;" if json_ticket.get('conflict_flag') else ""
+    alert_style = "background-color: #ffebee; border: 1px solid red; padding: 10px;" if ticket.confirm_with_customer else ""
+    conflict_style = "background-color: #fff3cd; border: 1px solid orange; padding: 10px;" if ticket.conflict_flag else ""
     
     html = f"""
     <div style="font-family: monospace; border: 2px solid #333; padding: 20px; max-width: 400px;">
@@ -51,35 +68,84 @@ def format_chef_ticket(json_ticket):
         <p>{taste_html}</p>
         <hr>
         <h3>COOKING NOTES</h3>
-        <p>{json_ticket.get('cooking_notes', '-')}</p>
+        <p>{ticket.cooking_notes or '-'}</p>
     </div>
     """
     
-    if json_ticket.get('conflict_flag'):
-        html += f"<div style='{conflict_style}'><b>⚠️ CONFLICT DETECTED:</b> {json_ticket.get('conflict_message')}</div>"
+    if ticket.conflict_flag:
+        html += f"<div style='{conflict_style}'><b>⚠️ CONFLICT DETECTED:</b> {ticket.conflict_message}</div>"
         
-    if json_ticket.get('confirm_with_customer'):
-        html += f"<div style='{alert_style}'><b>🛑 WAIT! CONFIRM WITH CUSTOMER:</b><br>{json_ticket.get('clarification_question')}</div>"
+    if ticket.confirm_with_customer:
+        html += f"<div style='{alert_style}'><b>🛑 WAIT! CONFIRM WITH CUSTOMER:</b><br>{ticket.clarification_question}</div>"
         
     return html
 
-# --- MAIN LOGIC ---
+def format_backend_status(note=""):
+    """Renders circuit breaker state per backend:model as a Markdown table."""
+    icons = {"closed": "🟢 closed", "half_open": "🟡 probing", "open": "🔴 open"}
+    lines = []
+    if note:
+        lines.append(f"{note}\n")
+    states = get_breaker_states()
+    if states:
+        lines.append("| Backend:Model | Breaker | Error rate | Avg latency | Rejected |")
+        lines.append("|---|---|---|---|---|")
+        for st in states:
+            latency = f"{st['avg_latency_s']}s" if st['avg_latency_s'] is not None else "-"
+            breaker = icons.get(st['state'], st['state'])
+            if st['state'] == "open":
+                breaker += f" (probe in {st['probe_in_s']}s)"
+            lines.append(f"| {st['name']} | {breaker} | {st['error_rate']:.0%} | {latency} | {st['rejected_total']} |")
+    else:
+        lines.append("_No LLM calls yet._")
+    flight = get_coalescing_stats()
+    lines.append(f"\nDuplicate orders coalesced: **{flight['coalesced']}** of {flight['calls']}")
+    tenants = get_tenant_stats()
+    per_tenant = ", ".join(f"{t} {b // 1024} KB" for t, b in tenants['tenants'].items())
+    lines.append(f"\nMenu cache: {tenants['cached_tenants']} restaurants, "
+                 f"{tenants['bytes'] // 1024} / {tenants['max_bytes'] // 1024} KB ({per_tenant})")
+    return "\n".join(lines)
 
-def process_order(
-    api_key, model_name, user_text, 
-    spice_slider, oil_radio, sweet_slider, salt_radio, 
-    diet_radio, allergy_check, onion_garlic
-):
-    """Callback for the 'Send Order' button."""
-    
-    # 1. API Key Check
+def check_backend(api_key, model_name):
+    """Callback for the health-check button: probes every backend with the selected model."""
     real_key = api_key or os.environ.get("GROQ_API_KEY")
     if not real_key:
-        return {
-            "error": "No API Key provided. Please enter one in the UI or set GROQ_API_KEY."
-        }, "<h3>⚠️ Error: Missing API Key</h3>"
+        return format_backend_status("⚠️ No API Key provided.")
+    ok, message = probe_model(real_key, model_name)
+    return format_backend_status(("✅ " if ok else "❌ ") + message)
 
-    # 2. Structure Inputs
+def update_kitchen_plan(ticket, tenant_id=DEFAULT_TENANT):
+    """Adds a confirmed ticket to the restaurant's kitchen queue and re-plans the stations."""
+    with KITCHEN_LOCK:
+        orders = KITCHEN_ORDERS.setdefault(tenant_id, [])
+        if ticket and ticket.ordered_items and not ticket.confirm_with_customer:
+            KITCHEN_TICKET_COUNT[tenant_id] = KITCHEN_TICKET_COUNT.get(tenant_id, 0) + 1
+            orders.append({
+                "arrival": (time.time() - APP_START) / 60.0,
+                "ticket_id": f"#{KITCHEN_TICKET_COUNT[tenant_id]}",
+                "ticket": ticket
+            })
+            del orders[:-KITCHEN_WINDOW]
+        # Plan from a snapshot so the scheduler runs outside the lock.
+        orders = list(orders)
+    try:
+        item_index = get_tenant_artifacts(tenant_id).item_index
+    except TenantError:
+        item_index = {}  # Unknown items go to the default station.
+    scheduler = KitchenScheduler(item_index=item_index)
+    return format_station_plan(scheduler.run(orders))
+
+def switch_restaurant(tenant_id):
+    """Callback for the restaurant selector: shows that outlet's menu and kitchen."""
+    return flatten_menu_for_display(tenant_id), update_kitchen_plan(None, tenant_id)
+
+# --- MAIN LOGIC ---
+
+def build_structured_inputs(
+    spice_slider, oil_radio, sweet_slider, salt_radio,
+    diet_radio, allergy_check, onion_garlic
+):
+    """Packs the preference controls into the dict sent to the parser."""
     structured_inputs = {
         "spice": spice_slider,
         "oil": oil_radio,
@@ -90,17 +156,57 @@ def process_order(
         "no_onion_garlic": not onion_garlic # Toggle logic: True = Allowed, False = No onion/garlic
     }
     
-    # 3. Call Logic
     # We invert the onion/garlic toggle naming for clarity in logic (UI says "Include?", logic wants constraints)
     if not onion_garlic:
         structured_inputs["dietary_constraints_extra"] = ["No Onion/Garlic"]
+    return structured_inputs
 
-    result_json = parse_intent(user_text, structured_inputs, real_key, model_name)
+def speculate_order(
+    tenant_id, api_key, model_name, user_text,
+    spice_slider, oil_radio, sweet_slider, salt_radio,
+    diet_radio, allergy_check, onion_garlic,
+    request: gr.Request
+):
+    """Change callback: local preview now, speculative LLM parse once inputs settle."""
+    structured_inputs = build_structured_inputs(
+        spice_slider, oil_radio, sweet_slider, salt_radio,
+        diet_radio, allergy_check, onion_garlic
+    )
+    real_key = api_key or os.environ.get("GROQ_API_KEY")
+    speculator = get_speculator(request.session_hash, speculate_llm=SPECULATE_LLM)
+    preview, speculating = speculator.update(user_text, structured_inputs, real_key, model_name, tenant_id)
+    return format_preview(preview, speculating)
+
+def process_order(
+    tenant_id, api_key, model_name, user_text, 
+    spice_slider, oil_radio, sweet_slider, salt_radio, 
+    diet_radio, allergy_check, onion_garlic,
+    request: gr.Request
+):
+    """Callback for the 'Send Order' button."""
+    
+    # 1. API Key Check
+    real_key = api_key or os.environ.get("GROQ_API_KEY")
+    if not real_key:
+        return {
+            "error": "No API Key provided. Please enter one in the UI or set GROQ_API_KEY."
+        }, "<h3>⚠️ Error: Missing API Key</h3>", format_backend_status(), update_kitchen_plan(None, tenant_id)
+
+    # 2. Structure Inputs
+    structured_inputs = build_structured_inputs(
+        spice_slider, oil_radio, sweet_slider, salt_radio,
+        diet_radio, allergy_check, onion_garlic
+    )
+    
+    # 3. Call Logic
+    # Reuses the ticket speculated while the customer was typing, if inputs still match.
+    speculator = get_speculator(request.session_hash, speculate_llm=SPECULATE_LLM)
+    ticket = speculator.resolve(user_text, structured_inputs, real_key, model_name, tenant_id)
     
     # 4. Format Output
-    ticket_html = format_chef_ticket(result_json)
+    ticket_html = format_chef_ticket(ticket)
     
-    return result_json, ticket_html
+    return ticket.to_dict(), ticket_html, format_backend_status(), update_kitchen_plan(ticket, tenant_id)
 
 
 # --- UI LAYOUT ---
@@ -113,19 +219,29 @@ with gr.Blocks(title="AI Waiter Prototype", theme=gr.themes.Soft()) as demo:
         # === LEFT COLUMN: CUSTOMER ===
         with gr.Column(scale=1):
             gr.Markdown("### 1. Setup & Menu")
+            tenant_selector = gr.Dropdown(
+                label="Restaurant",
+                choices=list_tenants(),
+                value=DEFAULT_TENANT
+            )
             api_key_input = gr.Textbox(
                 label="Groq API Key (Optional if env var set)", 
                 type="password",
                 placeholder="gsk_..."
             )
+            model_choices = get_router().available_models() or GROQ_MODELS
             model_selector = gr.Dropdown(
                 label="Model", 
-                choices=["llama3-70b-8192", "mixtral-8x7b-32768", "llama3-8b-8192"], 
-                value="llama3-70b-8192"
+                choices=model_choices, 
+                value=model_choices[0]
             )
             
+            with gr.Accordion("🩺 Backend Health", open=False):
+                backend_status = gr.Markdown(format_backend_status())
+                health_btn = gr.Button("Check Backend", size="sm")
+            
             with gr.Accordion("📖 View Menu", open=False):
-                gr.Markdown(flatten_menu_for_display())
+                menu_display = gr.Markdown(flatten_menu_for_display())
             
             gr.Markdown("### 2. Customize Preferencs")
             with gr.Group():
@@ -156,6 +272,7 @@ with gr.Blocks(title="AI Waiter Prototype", theme=gr.themes.Soft()) as demo:
                 placeholder="e.g., I'd like a Butter Chicken and 2 Naans, but make the chicken extra spicy.", 
                 label="Tell us what you want to eat..."
             )
+            order_preview = gr.Markdown()
             
             send_btn = gr.Button("👨‍🍳 Send to Chef", variant="primary", size="lg")
 
@@ -165,18 +282,44 @@ with gr.Blocks(title="AI Waiter Prototype", theme=gr.themes.Soft()) as demo:
             
             chef_ticket_display = gr.HTML(label="Visual Ticket")
             
+            with gr.Accordion("🔥 Kitchen Plan (batched by station)", open=False):
+                kitchen_plan = gr.Markdown(update_kitchen_plan(None))
+            
             with gr.Accordion("🔍 Debug / Raw JSON", open=True):
                 json_output = gr.JSON(label="Structured Intent Output")
 
     # --- EVENTS ---
+    order_inputs = [
+        tenant_selector, api_key_input, model_selector, user_text_input,
+        spice_slider, oil_radio, sweet_slider, salt_radio,
+        diet_radio, allergy_check, onion_garlic
+    ]
+    
+    # Speculative pre-parse on every edit; only the latest pending event runs.
+    for control in [tenant_selector, api_key_input, user_text_input, model_selector, spice_slider, oil_radio,
+                    sweet_slider, salt_radio, diet_radio, allergy_check, onion_garlic]:
+        control.change(
+            fn=speculate_order,
+            inputs=order_inputs,
+            outputs=[order_preview],
+            trigger_mode="always_last",
+            show_progress="hidden"
+        )
+    
     send_btn.click(
         fn=process_order,
-        inputs=[
-            api_key_input, model_selector, user_text_input,
-            spice_slider, oil_radio, sweet_slider, salt_radio,
-            diet_radio, allergy_check, onion_garlic
-        ],
-        outputs=[json_output, chef_ticket_display]
+        inputs=order_inputs,
+        outputs=[json_output, chef_ticket_display, backend_status, kitchen_plan]
+    )
+    tenant_selector.change(
+        fn=switch_restaurant,
+        inputs=[tenant_selector],
+        outputs=[menu_display, kitchen_plan]
+    )
+    health_btn.click(
+        fn=check_backend,
+        inputs=[api_key_input, model_selector],
+        outputs=[backend_status]
     )
 
 if __name__ == "__main__":
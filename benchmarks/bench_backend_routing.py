@@ -0,0 +1,87 @@
+# benchmarks/bench_backend_routing.py
+
+"""
+Exercises the backend router against two local stand-in servers: a fast
+"cloud" endpoint that sometimes stalls or fails, and a slower but steady
+"LAN" CPU server. Compares routing with and without hedged requests.
+
+    python -m benchmarks.bench_backend_routing --orders 80
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.llm_standin import StandinLLM
+
+
+class StallingStandin(StandinLLM):
+    """Stand-in whose latency occasionally spikes, like a congested cloud API."""
+
+    def __init__(self, stall_rate=0.15, stall_s=1.5, **kwargs):
+        super().__init__(**kwargs)
+        self.stall_rate = stall_rate
+        self.stall_s = stall_s
+        self._stall_rng = random.Random(3)
+
+    def handle(self, payload):
+        if self._stall_rng.random() < self.stall_rate:
+            time.sleep(self.stall_s)
+        return super().handle(payload)
+
+
+def run(router, n_orders):
+    from src.intent_parser import generate_system_prompt
+
+    system_prompt = generate_system_prompt()
+    latencies = []
+    errors = 0
+    for i in range(n_orders):
+        messages = [{"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"One Masala Dosa and Filter Coffee (table {i})"}]
+        started = time.perf_counter()
+        _, error, _, _ = router.complete(None, "llama3-70b-8192", messages)
+        latencies.append(time.perf_counter() - started)
+        errors += error is not None
+    latencies.sort()
+    return {
+        "orders": n_orders,
+        "errors": errors,
+        "mean_latency_ms": round(1000 * sum(latencies) / n_orders, 1),
+        "p90_latency_ms": round(1000 * latencies[int(0.9 * (n_orders - 1))], 1),
+        "max_latency_ms": round(1000 * latencies[-1], 1),
+        "backends": router.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend routing and hedging benchmark.")
+    parser.add_argument("--orders", type=int, default=60)
+    parser.add_argument("--hedge-delay", type=float, default=0.4)
+    args = parser.parse_args()
+
+    cloud = StallingStandin(latency_s=0.1, error_rate=0.05, seed=11).start()
+    lan = StandinLLM(latency_s=0.3, jitter_s=0.02, seed=12).start()
+    try:
+        os.environ["LLM_EXCHANGE_MODE"] = "off"
+        from src.llm_backends import BackendRouter, LLMBackend
+
+        def backends():
+            return [LLMBackend("cloud", cloud.url, models=["llama3-70b-8192"], expected_latency_s=0.5),
+                    LLMBackend("lan", lan.url, default_model="local-8b", models=["local-8b"],
+                               expected_latency_s=0.5)]
+
+        results = {
+            "no_hedging": run(BackendRouter(backends(), hedge_delay_s=None), args.orders),
+            f"hedge_after_{args.hedge_delay}s": run(BackendRouter(backends(), hedge_delay_s=args.hedge_delay), args.orders),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        cloud.stop()
+        lan.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_structured_output.py
+
+"""
+Compares json_object mode with native structured output (json_schema / tool)
+against a local stand-in server that drifts the way real models do.
+
+Reports, per mode: LLM round-trips per order (retry rate), fallback rate and
+order latency. The numbers only reflect the stand-in's failure model: how
+often json_object replies are prose or drift from the schema, and how often
+constrained generation fails the server-side check (--validate-fail-rate).
+They are not a measurement of any real model. Run from the repo root:
+
+    python -m benchmarks.bench_structured_output --orders 100
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.llm_standin import StandinLLM
+
+ORDERS = [
+    "One Butter Chicken and a Mango Lassi",
+    "2 Masala Dosa please, not too oily",
+    "Paneer Butter Masala with Amritsari Kulcha",
+    "Chole Bhature and Masala Chai",
+    "Hyderabadi Biryani, extra spicy",
+    "Vada Pav and Filter Coffee",
+    "Dal Makhani, Jalebi for dessert",
+    "Pav Bhaji and Nimbu Pani",
+]
+
+
+def run_mode(llm_client, intent_parser, standin, mode, model_name, n_orders):
+    os.environ["LLM_STRUCTURED_OUTPUT"] = mode
+    before = standin.requests
+    latencies = []
+    fallbacks = 0
+    for i in range(n_orders):
+        # Unique text per order so the request coalescer never merges them.
+        text = f"{ORDERS[i % len(ORDERS)]} (table {i})"
+        started = time.perf_counter()
+        ticket = intent_parser._parse_intent_uncoalesced(text, {"spice": 2}, "standin-key", model_name)
+        latencies.append(time.perf_counter() - started)
+        if ticket.confidence_score <= 0.1:
+            fallbacks += 1
+    latencies.sort()
+    calls = standin.requests - before
+    return {
+        "mode": mode,
+        "model": model_name,
+        "orders": n_orders,
+        "llm_requests": calls,
+        "retry_rate": round(calls / n_orders - 1, 3),
+        "fallback_rate": round(fallbacks / n_orders, 3),
+        "mean_latency_ms": round(1000 * sum(latencies) / n_orders, 1),
+        "p90_latency_ms": round(1000 * latencies[int(0.9 * (n_orders - 1))], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.15, help="Stand-in latency per request (s)")
+    parser.add_argument("--prose-rate", type=float, default=0.15)
+    parser.add_argument("--schema-drift-rate", type=float, default=0.05)
+    parser.add_argument("--validate-fail-rate", type=float, default=0.05,
+                        help="Share of constrained requests failing with json_validate_failed")
+    args = parser.parse_args()
+
+    standin = StandinLLM(latency_s=args.latency, prose_rate=args.prose_rate,
+                         schema_drift_rate=args.schema_drift_rate,
+                         validate_fail_rate=args.validate_fail_rate).start()
+    try:
+        # The client reads the URL at import time.
+        os.environ["GROQ_API_URL"] = standin.url
+        os.environ["LLM_EXCHANGE_MODE"] = "off"
+        from src import intent_parser, llm_client
+
+        results = []
+        for mode in ("json_object", "json_schema", "tool"):
+            results.append(run_mode(llm_client, intent_parser, standin, mode, "standin-capable", args.orders))
+
+        # A model without strict mode: first call learns that, the rest send the non-strict schema.
+        standin.strict_supported = False
+        results.append(run_mode(llm_client, intent_parser, standin, "json_schema", "standin-nonstrict", args.orders))
+
+        # A model without native support: first call learns that, the rest go straight to json_object.
+        standin.supported_modes = {"json_object"}
+        results.append(run_mode(llm_client, intent_parser, standin, "json_schema", "standin-basic", args.orders))
+        print(json.dumps({"results": results,
+                          "learned_capabilities": llm_client.get_structured_output_capabilities()}, indent=2))
+    finally:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# benchmarks/llm_standin.py
+
+"""
+Local stand-in for an OpenAI-compatible chat completions server.
+
+Used by the benchmarks to exercise the real HTTP client without network
+access or an API key. It builds a ticket by keyword-matching the order text
+against the menu, and can be told to misbehave the way real models do:
+- prose_rate: fraction of json_object replies wrapped in chatter (not JSON)
+- schema_drift_rate: fraction of json_object replies that break the schema
+- error_rate: fraction of requests answered with HTTP 503
+- latency_s / jitter_s: simulated generation time
+- supported_modes: which structured output modes are accepted; others get
+  the 400 "not supported" error a real server returns
+- strict_supported: whether json_schema accepts "strict": true
+- validate_fail_rate: fraction of constrained (json_schema, tool) requests
+  answered with the 400 json_validate_failed error a real server returns when
+  the model's output fails the server's own schema check
+
+Constrained requests that don't fail validation return schema-valid output.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.menu_data import get_all_items_flat
+
+
+def _ticket_for(order_text):
+    lower_text = order_text.lower()
+    items = [{"name": item['name'], "quantity": 1}
+             for item in get_all_items_flat() if item['name'].lower() in lower_text]
+    return {
+        "ordered_items": items,
+        "dietary_constraints": [],
+        "taste_profile": {"spice_level": "Medium", "oil_level": "Medium", "sweetness": "Low", "salt_level": "Normal"},
+        "cooking_notes": "Standard preparation.",
+        "confirm_with_customer": not items,
+        "confidence_score": 0.9 if items else 0.3,
+        "conflict_flag": False
+    }
+
+
+class StandinLLM:
+    """A threaded local chat completions server. Use as a context manager."""
+
+    def __init__(self, latency_s=0.2, jitter_s=0.05, prose_rate=0.0, schema_drift_rate=0.0,
+                 error_rate=0.0, supported_modes=("json_object", "json_schema", "tool"), strict_supported=True,
+                 validate_fail_rate=0.0, seed=1):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.prose_rate = prose_rate
+        self.schema_drift_rate = schema_drift_rate
+        self.error_rate = error_rate
+        self.supported_modes = set(supported_modes)
+        self.strict_supported = strict_supported
+        self.validate_fail_rate = validate_fail_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def _roll(self, rate):
+        with self._lock:
+            return self._rng.random() < rate
+
+    def handle(self, payload):
+        """Returns (status, body dict) for one chat completion request."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_s + self._rng.uniform(-self.jitter_s, self.jitter_s))
+        time.sleep(delay)
+
+        if self._roll(self.error_rate):
+            return 503, {"error": {"message": "Service unavailable"}}
+
+        if "tools" in payload:
+            mode = "tool"
+        else:
+            mode = payload.get("response_format", {}).get("type", "text")
+        if mode in ("json_schema", "tool") and mode not in self.supported_modes:
+            return 400, {"error": {"message": f"{mode} is not supported with this model (response_format/tool)",
+                                   "type": "invalid_request_error"}}
+        if mode == "json_schema" and payload["response_format"]["json_schema"].get("strict") \
+                and not self.strict_supported:
+            return 400, {"error": {"message": "strict mode is not supported with this model",
+                                   "type": "invalid_request_error"}}
+
+        messages = payload.get("messages", [])
+        order_text = next((m["content"] for m in messages if m["role"] == "user"), "")
+        ticket = _ticket_for(order_text)
+        content = json.dumps(ticket)
+        is_retry = len(messages) > 2
+
+        if mode in ("json_schema", "tool") and self._roll(self.validate_fail_rate):
+            return 400, {"error": {"message": "Failed to generate JSON. Please adjust your prompt.",
+                                   "type": "invalid_request_error", "code": "json_validate_failed",
+                                   "failed_generation": content[:-1]}}
+
+        if mode not in ("json_schema", "tool") and not is_retry:
+            if self._roll(self.prose_rate):
+                content = "Sure! Here is the kitchen ticket you asked for:\n" + content
+            elif self._roll(self.schema_drift_rate):
+                drifted = dict(ticket)
+                drifted.pop("taste_profile")
+                content = json.dumps(drifted)
+
+        message = {"role": "assistant", "content": content}
+        if mode == "tool":
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_1", "type": "function",
+                "function": {"name": payload["tool_choice"]["function"]["name"], "arguments": content}
+            }]}
+        return 200, {
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": sum(len(m.get("content") or "") for m in messages) // 4,
+                      "completion_tokens": len(content) // 4}
+        }
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status, body = standin.handle(json.loads(self.rfile.read(length) or b"{}"))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,167 @@
+# src/circuit_breaker.py
+
+"""
+Circuit breaker for the LLM backend.
+
+Tracks the recent error rate and latency of each backend and model. When too many recent
+calls failed (or were too slow), the breaker opens and callers are refused
+immediately, so orders go straight to the fallback ticket instead of waiting
+out the HTTP timeout. After a cool-down a limited number of half-open probe
+calls are let through; a healthy probe closes the breaker again.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker for one backend/model.
+
+    Args:
+        name (str): Label shown in status output ("backend:model").
+        window_seconds (float): How far back outcomes are considered.
+        min_calls (int): Minimum calls in the window before the breaker may trip.
+        failure_rate_threshold (float): Fraction of bad calls that opens the breaker.
+        slow_call_seconds (float): Successful calls slower than this count as bad.
+        open_seconds (float): Cool-down before half-open probes are allowed.
+        half_open_max_calls (int): Concurrent probes allowed while half-open.
+    """
+
+    def __init__(self, name, window_seconds=60.0, min_calls=4, failure_rate_threshold=0.5,
+                 slow_call_seconds=10.0, open_seconds=20.0, half_open_max_calls=1,
+                 clock=time.monotonic):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (timestamp, is_bad, latency)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._rejected = 0
+
+    def _prune(self, now):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+
+    def allow_request(self):
+        """Returns True if a call may go to the backend right now."""
+        with self._lock:
+            now = self._clock()
+            if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def state(self):
+        """Current state, reporting an open breaker past its cool-down as half-open."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def record_success(self, latency):
+        """Records a completed call. Slow successes count against the breaker."""
+        self._record(latency > self.slow_call_seconds, latency)
+
+    def record_failure(self, latency):
+        """Records a failed call (timeout, connection error, 5xx, rate limit)."""
+        self._record(True, latency)
+
+    def record_ignored(self):
+        """
+        Releases a probe slot without recording an outcome.
+
+        Used for errors that say nothing about backend health, such as a bad
+        API key or a malformed request.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def _record(self, is_bad, latency):
+        with self._lock:
+            now = self._clock()
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if is_bad:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._outcomes.append((now, False, latency))
+                return
+            self._outcomes.append((now, is_bad, latency))
+            self._prune(now)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                bad = sum(1 for _, b, _ in self._outcomes if b)
+                if bad / len(self._outcomes) >= self.failure_rate_threshold:
+                    self._open(now)
+
+    def snapshot(self):
+        """Returns a dict describing current state, error rate and latency."""
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            calls = len(self._outcomes)
+            bad = sum(1 for _, b, _ in self._outcomes if b)
+            latencies = [lat for _, _, lat in self._outcomes]
+            state = self._state
+            retry_in = 0.0
+            if state == OPEN:
+                retry_in = max(0.0, self.open_seconds - (now - self._opened_at))
+                if retry_in == 0.0:
+                    state = HALF_OPEN
+            return {
+                "name": self.name,
+                "state": state,
+                "calls_in_window": calls,
+                "error_rate": round(bad / calls, 3) if calls else 0.0,
+                "avg_latency_s": round(sum(latencies) / calls, 3) if calls else None,
+                "rejected_total": self._rejected,
+                "probe_in_s": round(retry_in, 1),
+            }
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Returns the shared breaker for a backend/model, creating it on first use."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            _breakers[name] = breaker
+        return breaker
+
+
+def get_breaker_states():
+    """Returns snapshots of every breaker created so far."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return [b.snapshot() for b in breakers]
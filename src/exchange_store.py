@@ -0,0 +1,309 @@
+# src/exchange_store.py
+
+"""
+On-disk record/replay store for LLM exchanges.
+
+Every successful `call_groq_api` exchange can be written to a SQLite file:
+model, the backend that answered, the requested structured output mode, a
+hash of the request, the response text, latency and token counts. Message bodies are
+stored once each, zlib-compressed and keyed by content hash, so the large
+system prompt costs the same whether it was sent once or a million times.
+
+Modes (env `LLM_EXCHANGE_MODE`):
+    off     - store not used (default)
+    record  - always call the API, record every exchange
+    replay  - answer only from the store, never touch the network
+    cache   - answer from the store when possible, otherwise call and record
+
+The database path comes from env `LLM_EXCHANGE_DB`. The most recent exchanges
+are loaded into memory when the store is opened, so lookups right after a
+deploy don't go to disk.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+MODES = ("off", "record", "replay", "cache")
+DEFAULT_DB_PATH = "llm_exchanges.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exchanges (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    model TEXT NOT NULL,
+    backend TEXT,
+    mode TEXT,
+    speculative INTEGER,
+    request_hash TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    response BLOB NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_exchanges_request ON exchanges (request_hash);
+"""
+# Columns added after the first release; older store files get them on open.
+_ADDED_COLUMNS = {"backend": "TEXT", "mode": "TEXT", "speculative": "INTEGER"}
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_request(model_name, messages, temperature=None, backend=None, mode=None):
+    """
+    Stable hash identifying a request: model, messages, temperature, the
+    backend that serves it ("backend:model") and the requested structured
+    output mode (as configured, not the mode a fallback ended up using).
+    """
+    return _sha(json.dumps([model_name, messages, temperature, backend, mode], sort_keys=True, ensure_ascii=False))
+
+
+class ExchangeStore:
+    """
+    SQLite-backed exchange log with a small in-memory LRU in front of lookups.
+
+    Iteration streams rows from a cursor, so stores with millions of records
+    can be scanned without loading them into memory.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, memory_entries=1024):
+        self.path = path
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # request_hash -> response text
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(exchanges)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE exchanges ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, request_hash, response):
+        self._memory[request_hash] = response
+        self._memory.move_to_end(request_hash)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def record(self, model_name, messages, response, latency=None, usage=None, temperature=None,
+               backend=None, mode=None, speculative=False):
+        """
+        Appends one exchange. Returns the request hash.
+
+        Speculative exchanges (made while the customer was still typing) are
+        tagged so order-level consumers can skip them; lookups still use them.
+        """
+        usage = usage or {}
+        request_hash = hash_request(model_name, messages, temperature, backend, mode)
+        refs = []
+        blob_rows = []
+        for msg in messages:
+            body = msg.get("content") or ""
+            body_hash = _sha(body)
+            refs.append([msg.get("role"), body_hash])
+            blob_rows.append((body_hash, zlib.compress(body.encode("utf-8"))))
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", blob_rows)
+            self._conn.execute(
+                "INSERT INTO exchanges (created_at, model, backend, mode, speculative, request_hash, messages,"
+                " response, latency, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), model_name, backend, mode, int(speculative), request_hash, json.dumps(refs),
+                 zlib.compress(response.encode("utf-8")), latency,
+                 usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            )
+            self._conn.commit()
+            self._remember(request_hash, response)
+        return request_hash
+
+    def lookup(self, model_name, messages, temperature=None, backend=None, mode=None):
+        """
+        Returns the most recent response recorded for this request from this
+        backend in this output mode, or None.
+        """
+        request_hash = hash_request(model_name, messages, temperature, backend, mode)
+        with self._lock:
+            if request_hash in self._memory:
+                self._memory.move_to_end(request_hash)
+                return self._memory[request_hash]
+            row = self._conn.execute(
+                "SELECT response FROM exchanges WHERE request_hash = ? ORDER BY id DESC LIMIT 1",
+                (request_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            response = zlib.decompress(row[0]).decode("utf-8")
+            self._remember(request_hash, response)
+            return response
+
+    def warm(self, limit=None):
+        """
+        Loads the most recent exchanges into the in-memory LRU.
+
+        Called when the shared store is opened, so the first lookups after a
+        deploy don't hit disk. Returns the number of entries loaded.
+        """
+        limit = limit or self.memory_entries
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_hash, response FROM exchanges ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+            # Oldest first so the newest end up most-recently-used.
+            for request_hash, response in reversed(rows):
+                self._remember(request_hash, zlib.decompress(response).decode("utf-8"))
+        return len(rows)
+
+    def _load_messages(self, refs):
+        messages = []
+        for role, body_hash in json.loads(refs):
+            row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (body_hash,)).fetchone()
+            content = zlib.decompress(row[0]).decode("utf-8") if row else None
+            messages.append({"role": role, "content": content})
+        return messages
+
+    def iter_exchanges(self, model_name=None, with_messages=False, batch_size=500, speculative=None):
+        """
+        Yields recorded exchanges as dicts, oldest first, streaming from disk.
+
+        Args:
+            model_name (str): Only yield exchanges for this model.
+            with_messages (bool): Also decode the full request messages.
+            batch_size (int): Rows fetched from SQLite per round-trip.
+            speculative (bool): If False, skip speculative exchanges; if True,
+                yield only those; None yields both.
+        """
+        sql = ("SELECT id, created_at, model, request_hash, messages, response, latency,"
+               " prompt_tokens, completion_tokens, backend, mode, speculative FROM exchanges WHERE id > ?")
+        params = []
+        if model_name:
+            sql += " AND model = ?"
+            params.append(model_name)
+        if speculative is not None:
+            sql += " AND COALESCE(speculative, 0) = ?"
+            params.append(int(speculative))
+        sql += " ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            # Page by id instead of holding a cursor open, so writers aren't blocked.
+            with self._lock:
+                rows = self._conn.execute(sql, [last_id] + params + [batch_size]).fetchall()
+                decoded = []
+                for row in rows:
+                    record = {
+                        "id": row[0],
+                        "created_at": row[1],
+                        "model": row[2],
+                        "request_hash": row[3],
+                        "response": zlib.decompress(row[5]).decode("utf-8"),
+                        "latency": row[6],
+                        "prompt_tokens": row[7],
+                        "completion_tokens": row[8],
+                        "backend": row[9],
+                        "mode": row[10],
+                        "speculative": bool(row[11]),
+                    }
+                    if with_messages:
+                        record["messages"] = self._load_messages(row[4])
+                    decoded.append(record)
+            if not decoded:
+                return
+            yield from decoded
+            last_id = decoded[-1]["id"]
+
+    def stats(self):
+        """Returns record counts, distinct requests, token totals and file size."""
+        with self._lock:
+            count, distinct, prompt_tokens, completion_tokens, avg_latency = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT request_hash), SUM(prompt_tokens),"
+                " SUM(completion_tokens), AVG(latency) FROM exchanges"
+            ).fetchone()
+            blobs = self._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return {
+            "exchanges": count,
+            "distinct_requests": distinct,
+            "message_blobs": blobs,
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "avg_latency_s": round(avg_latency, 3) if avg_latency is not None else None,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "memory_entries": len(self._memory),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_exchange_mode():
+    """Returns the configured mode, defaulting to 'off' for unknown values."""
+    mode = os.environ.get("LLM_EXCHANGE_MODE", "off").lower()
+    return mode if mode in MODES else "off"
+
+
+def get_exchange_store():
+    """Returns the shared store, or None when the mode is 'off'. Warms it on first open."""
+    global _store
+    if get_exchange_mode() == "off":
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ExchangeStore(os.environ.get("LLM_EXCHANGE_DB", DEFAULT_DB_PATH))
+            _store.warm()
+        return _store
+
+
+def reparse_all(store, model_name=None):
+    """
+    Re-runs the current JSON parsing and validation code over every recorded
+    response. Returns counts of valid, schema-invalid and unparseable responses.
+    """
+    from src.intent_parser import try_parse_json
+    from src.intent_schema import validate_json
+
+    counts = {"total": 0, "valid": 0, "schema_invalid": 0, "not_json": 0}
+    for record in store.iter_exchanges(model_name=model_name):
+        counts["total"] += 1
+        parsed, _ = try_parse_json(record["response"])
+        if parsed is None:
+            counts["not_json"] += 1
+        elif validate_json(parsed)[0]:
+            counts["valid"] += 1
+        else:
+            counts["schema_invalid"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or re-run a recorded LLM exchange store.")
+    parser.add_argument("command", choices=["stats", "reparse"])
+    parser.add_argument("--db", default=os.environ.get("LLM_EXCHANGE_DB", DEFAULT_DB_PATH))
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    exchange_store = ExchangeStore(args.db)
+    if args.command == "stats":
+        print(json.dumps(exchange_store.stats(), indent=2))
+    else:
+        started = time.time()
+        result = reparse_all(exchange_store, model_name=args.model)
+        result["seconds"] = round(time.time() - started, 2)
+        print(json.dumps(result, indent=2))
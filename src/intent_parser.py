@@ -2,21 +2,34 @@
 
 import json
 import logging
-from src.menu_data import MENU, get_all_items_flat
-from src.intent_schema import INTENT_SCHEMA, validate_json
+from src.menu_data import get_menu_for_prompt
+from src.intent_schema import INTENT_SCHEMA
+from src.ticket_model import Ticket, TicketValidationError, OrderedItem, TasteProfile
 from src.llm_client import call_groq_api
+from src.request_coalescer import SingleFlight, make_order_key
+from src.tenants import DEFAULT_TENANT, TenantError, get_tenant_artifacts
 
 # Basic logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_system_prompt():
-    """Generates the system prompt with menu context and schema enforcement."""
+# First ambiguity reason on every fallback ticket; see `is_fallback_ticket`.
+FALLBACK_MARKER = "LLM Generation Failed"
+
+# Identical orders submitted at the same moment share one LLM call.
+# Tickets are read-only, so waiters can share the leader's object.
+_order_flight = SingleFlight(copy_results=False)
+
+def generate_system_prompt(menu=None):
+    """
+    Generates the system prompt with menu context and schema enforcement.
+    Defaults to the built-in menu; per-restaurant prompts are cached in src/tenants.py.
+    """
     
     # Flatten menu for prompt context
     # In a real app with huge menu, we would use RAG or just send relevant categories.
     # For this prototype, we send the whole menu structure to ensure high accuracy.
-    menu_str = json.dumps(MENU, indent=2)
+    menu_str = json.dumps(get_menu_for_prompt(menu), indent=2)
     schema_str = json.dumps(INTENT_SCHEMA, indent=2)
     
     prompt = f"""
@@ -40,21 +53,48 @@ def generate_system_prompt():
     """
     return prompt
 
-def parse_intent(user_text, structured_inputs, api_key, model_name):
+def parse_intent(user_text, structured_inputs, api_key, model_name, tenant_id=DEFAULT_TENANT, speculative=False):
     """
     Main function to parse user intent.
     
+    Concurrent calls with the same normalized order text, preferences,
+    model, restaurant and API key are coalesced into a single LLM call.
+    
     Args:
         user_text (str): Free text input.
         structured_inputs (dict): Dict of UI controls (spice, allergy, etc).
         api_key (str): Groq API Key.
         model_name (str): Selected Model.
+        tenant_id (str): Restaurant whose menu the order is against.
+        speculative (bool): Parse started while the customer is still typing
+            (see src/speculation.py). Its failures don't count against the
+            circuit breaker, its exchanges are tagged in the exchange store,
+            and a Send that joins it isn't counted as a duplicate order.
         
     Returns:
-        dict: The final parsed JSON intent.
+        Ticket: The validated kitchen ticket (or a fallback ticket).
     """
+    key = make_order_key(user_text, structured_inputs, model_name, tenant_id, api_key=api_key)
+    return _order_flight.do(key, _parse_intent_uncoalesced, user_text, structured_inputs, api_key, model_name, tenant_id,
+                            speculative, tag="speculative" if speculative else None)
+
+async def parse_intent_async(user_text, structured_inputs, api_key, model_name, tenant_id=DEFAULT_TENANT):
+    """Async version of `parse_intent`, sharing the same in-flight table."""
+    key = make_order_key(user_text, structured_inputs, model_name, tenant_id, api_key=api_key)
+    return await _order_flight.do_async(key, _parse_intent_uncoalesced, user_text, structured_inputs, api_key, model_name, tenant_id)
+
+def get_coalescing_stats():
+    """Returns counters for coalesced orders (calls, executed, coalesced, in_flight)."""
+    return _order_flight.stats()
+
+def _parse_intent_uncoalesced(user_text, structured_inputs, api_key, model_name, tenant_id=DEFAULT_TENANT, speculative=False):
+    """Runs the full LLM parse for a single order. See `parse_intent`."""
     
-    system_prompt = generate_system_prompt()
+    try:
+        system_prompt = get_tenant_artifacts(tenant_id).system_prompt
+    except TenantError as e:
+        logger.error(f"Menu unavailable for restaurant {tenant_id!r}: {e}")
+        return fallback_logic(user_text, structured_inputs, tenant_id=tenant_id, error_msg=f"Menu unavailable: {e}")
     
     user_message_content = f"""
     ### USER INPUTS
@@ -72,11 +112,12 @@ def parse_intent(user_text, structured_inputs, api_key, model_name):
     print(f"[DEBUG] Sending request to {model_name}...")
     
     # 1. First Attempt
-    response_content, error = call_groq_api(api_key, model_name, messages)
+    response_content, error = call_groq_api(api_key, model_name, messages, response_schema=INTENT_SCHEMA,
+                                            speculative=speculative)
     
     if error:
         logger.error(f"LLM Call Failed: {error}")
-        return fallback_logic(user_text, structured_inputs, error_msg=error)
+        return fallback_logic(user_text, structured_inputs, tenant_id=tenant_id, error_msg=error)
         
     # 2. Parse & Validate
     parsed_json, json_error = try_parse_json(response_content)
@@ -87,31 +128,36 @@ def parse_intent(user_text, structured_inputs, api_key, model_name):
         messages.append({"role": "assistant", "content": response_content})
         messages.append({"role": "user", "content": f"Your response was not valid JSON: {json_error}. Please fix it and output ONLY valid JSON."})
         
-        response_content_retry, error_retry = call_groq_api(api_key, model_name, messages)
+        response_content_retry, error_retry = call_groq_api(api_key, model_name, messages, response_schema=INTENT_SCHEMA,
+                                                            speculative=speculative)
         if error_retry:
-            return fallback_logic(user_text, structured_inputs, error_msg=error_retry)
+            return fallback_logic(user_text, structured_inputs, tenant_id=tenant_id, error_msg=error_retry)
             
         parsed_json, json_error = try_parse_json(response_content_retry)
         
     # 4. Final Verification or Fallback
     if parsed_json:
-        # Schema check
-        is_valid, schema_error = validate_json(parsed_json)
-        if is_valid:
-            print("[DEBUG] Valid JSON parsed successfully.")
-            return parsed_json
-        else:
-             logger.error(f"Schema Validation Failed: {schema_error}")
-             # Even if schema validation fails, we might return partial data or fallback
-             # For rigorousness, let's fallback if critical fields are missing
-             return fallback_logic(user_text, structured_inputs, error_msg=f"Schema invalid: {schema_error}")
+        # Schema check: the Ticket model is the single validation point
+        try:
+            ticket = Ticket.from_dict(parsed_json)
+        except TicketValidationError as schema_error:
+            logger.error(f"Schema Validation Failed: {schema_error}")
+            # For rigorousness, fallback if critical fields are missing or malformed
+            return fallback_logic(user_text, structured_inputs, tenant_id=tenant_id, error_msg=f"Schema invalid: {schema_error}")
+        print("[DEBUG] Valid JSON parsed successfully.")
+        return ticket
     else:
         logger.error("Retry failed to produce valid JSON.")
-        return fallback_logic(user_text, structured_inputs, error_msg="Model failed to produce JSON twice.")
+        return fallback_logic(user_text, structured_inputs, tenant_id=tenant_id, error_msg="Model failed to produce JSON twice.")
 
+def is_fallback_ticket(ticket):
+    """True if the ticket came from `fallback_logic` rather than the LLM."""
+    return FALLBACK_MARKER in ticket.ambiguity_reasons
 
 def try_parse_json(content):
     """Attempts to parse JSON from string, handling potential markdown fences."""
+    if not content:
+        return None, "Empty response"
     try:
         # Strip markdown fences if present
         cleaned = content.strip()
@@ -126,35 +172,58 @@ def try_parse_json(content):
     except json.JSONDecodeError as e:
         return None, str(e)
 
-def fallback_logic(user_text, structured_inputs, error_msg="Unknown Error"):
+def _slider_to_level(value, levels):
+    """Maps a 0-5 UI slider onto the schema's enum levels."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    index = int(round(max(0.0, min(5.0, value)) / 5 * (len(levels) - 1)))
+    return levels[index]
+
+def _radio_level(value, levels):
+    return value if value in levels else None
+
+def fallback_logic(user_text, structured_inputs, error_msg="Unknown Error", tenant_id=DEFAULT_TENANT):
     """
     Deterministic fallback when LLM fails.
     Constructs a basic safe ticket based on structured inputs.
+    Never raises: if the restaurant's menu is unavailable, no items are detected.
     """
     print(f"[DEBUG] Triggering Fallback logic due to: {error_msg}")
     
     # Try keywords matching from text
-    detected_items = []
-    all_items = get_all_items_flat()
-    lower_text = user_text.lower()
-    
-    for item in all_items:
-        if item['name'].lower() in lower_text:
-            detected_items.append({"name": item['name'], "quantity": 1, "notes": "Detected via keyword match"})
+    try:
+        artifacts = get_tenant_artifacts(tenant_id)
+        detected_items = [
+            OrderedItem(artifacts.items[position]['name'], 1, "Detected via keyword match")
+            for position in artifacts.match_items(user_text)
+        ]
+    except TenantError:
+        detected_items = []
+    
+    constraints = []
+    diet = structured_inputs.get('diet')
+    if diet and diet != "None":
+        constraints.append(diet)
+    constraints.extend(structured_inputs.get('allergies') or [])
+    constraints.extend(structured_inputs.get('dietary_constraints_extra') or [])
+    
+    taste = TasteProfile(
+        spice_level=_slider_to_level(structured_inputs.get('spice', 0), ("Low", "Medium", "High", "Very High")),
+        oil_level=_radio_level(structured_inputs.get('oil'), ("Low", "Medium", "High")),
+        sweetness=_slider_to_level(structured_inputs.get('sweetness', 0), ("Low", "Medium", "High")),
+        salt_level=_radio_level(structured_inputs.get('salt', 'Normal'), ("Low", "Normal", "High"))
+    )
             
-    return {
-        "ordered_items": detected_items,
-        "dietary_constraints": structured_inputs.get('diet', []) + structured_inputs.get('allergies', []),
-        "taste_profile": {
-            "spice_level":  f"Fallback: {structured_inputs.get('spice', 0)}/5",
-            "oil_level": structured_inputs.get('oil', 'Unknown'),
-             "sweetness": str(structured_inputs.get('sweetness', 0)),
-             "salt_level": structured_inputs.get('salt', 'Normal')
-        },
-        "cooking_notes": "FALLBACK MODE ACTIVE. LLM Failed. Chef please verify order manualy.",
-        "confirm_with_customer": True,
-        "clarification_question": "Our system is having trouble. Please confirm your order with the staff.",
-        "confidence_score": 0.1,
-        "ambiguity_reasons": ["LLM Generation Failed", error_msg],
-        "conflict_flag": False
-    }
+    return Ticket(
+        ordered_items=detected_items,
+        dietary_constraints=constraints,
+        taste_profile=taste,
+        cooking_notes="FALLBACK MODE ACTIVE. LLM Failed. Chef please verify order manualy.",
+        confirm_with_customer=True,
+        clarification_question="Our system is having trouble. Please confirm your order with the staff.",
+        confidence_score=0.1,
+        ambiguity_reasons=[FALLBACK_MARKER, error_msg],
+        conflict_flag=False
+    )
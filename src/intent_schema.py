@@ -71,20 +71,13 @@ INTENT_SCHEMA = {
 
 def validate_json(json_data):
     """
-    Very basic validation helper. 
-    In a real app, use 'jsonschema' lib, but we are keeping it pure python as requested.
+    Validates ticket JSON against the schema.
+    Delegates to the Ticket model so there is a single validation point.
     Returns: (is_valid, error_message)
     """
+    from src.ticket_model import Ticket, TicketValidationError
     try:
-        # Check required fields
-        for field in INTENT_SCHEMA["required"]:
-            if field not in json_data:
-                return False, f"Missing required field: {field}"
-        
-        # Check ordered_items structure
-        if not isinstance(json_data.get("ordered_items", []), list):
-             return False, "ordered_items must be a list"
-             
+        Ticket.from_dict(json_data)
         return True, ""
-    except Exception as e:
+    except TicketValidationError as e:
         return False, str(e)
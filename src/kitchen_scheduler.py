@@ -0,0 +1,376 @@
+# src/kitchen_scheduler.py
+
+"""
+Kitchen station scheduler.
+
+Takes the tickets produced by `parse_intent` and turns them into cooking jobs:
+- every item is routed to its station (tandoor, dosa tawa, fryer, ...),
+- identical items with the same taste profile and notes are merged into one
+  batch, up to the station's batch size, for as long as the batch is waiting,
+- short items are held back so a table's dishes finish together instead of
+  the naan going cold while the tandoori chicken is still in the oven.
+
+The scheduler is an event-driven simulation in minutes, so the same code
+plans a live board and measures throughput on recorded order streams
+(see `simulate`).
+"""
+
+import heapq
+import itertools
+import json
+import random
+
+from src.menu_data import STATIONS, get_item_index
+from src.ticket_model import Ticket, TicketValidationError, OrderedItem, TasteProfile
+
+DEFAULT_STATION = "curry"
+DEFAULT_PREP_TIME = 10
+
+
+def _normalize_notes(notes):
+    text = " ".join((notes or "").lower().split())
+    return "" if text in ("-", "none") else text
+
+
+class Job:
+    """One batch cooked at one station slot."""
+
+    def __init__(self, job_id, station, item_name, batch_key, prep_time, capacity, created):
+        self.job_id = job_id
+        self.station = station
+        self.item_name = item_name
+        self.batch_key = batch_key
+        self.prep_time = prep_time
+        self.capacity = capacity
+        self.created = created
+        self.members = []  # (ticket_id, quantity)
+        self.units = 0
+        self.start = None
+        self.finish = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "station": self.station,
+            "item": self.item_name,
+            "units": self.units,
+            "tickets": [ticket_id for ticket_id, _ in self.members],
+            "start": self.start,
+            "finish": self.finish,
+        }
+
+
+class _TicketState:
+    def __init__(self, ticket_id, table, arrival):
+        self.ticket_id = ticket_id
+        self.table = table
+        self.arrival = arrival
+        self.jobs = []
+        self.expected_finish = arrival
+
+
+class KitchenScheduler:
+    """
+    Event-driven scheduler over a stream of tickets.
+
+    Args:
+        batching (bool): Merge identical, compatible items across tickets.
+        align_finish (bool): Hold short items so each ticket finishes together.
+        stations (dict): Station name -> {"slots", "batch_size"}; defaults to the menu's.
+            Items for a station that isn't configured go to DEFAULT_STATION, or
+            to the first configured station if that isn't configured either.
+        item_index (dict): Lower-cased item name -> menu item; defaults to the menu's.
+
+    Raises:
+        ValueError: If a station doesn't have positive integer slots and batch_size.
+    """
+
+    def __init__(self, batching=True, align_finish=True, stations=None, item_index=None):
+        self.batching = batching
+        self.align_finish = align_finish
+        self.stations = stations or STATIONS
+        for station, cfg in self.stations.items():
+            for field in ("slots", "batch_size"):
+                value = cfg.get(field) if isinstance(cfg, dict) else None
+                if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                    raise ValueError(f"Station {station!r} needs a positive integer {field}, got {value!r}")
+        self.default_station = DEFAULT_STATION if DEFAULT_STATION in self.stations else next(iter(self.stations))
+        self.item_index = item_index or get_item_index()
+
+    def _item_meta(self, name):
+        item = self.item_index.get((name or "").lower(), {})
+        station = item.get('station', self.default_station)
+        if station not in self.stations:
+            station = self.default_station
+        return station, item.get('prep_time', DEFAULT_PREP_TIME)
+
+    def _eligible_at(self, job, tickets):
+        if not self.align_finish:
+            return job.created
+        target = min(tickets[ticket_id].expected_finish for ticket_id, _ in job.members)
+        return max(job.created, target - job.prep_time)
+
+    def _priority(self, job, tickets):
+        if not self.align_finish:
+            return (job.created, job.job_id)
+        # Least slack first: the job whose tickets need it soonest.
+        target = min(tickets[ticket_id].expected_finish for ticket_id, _ in job.members)
+        return (target - job.prep_time, -job.prep_time, job.job_id)
+
+    def run(self, order_stream):
+        """
+        Schedules an order stream.
+
+        Args:
+            order_stream (iterable): Dicts with "arrival" (minutes), "ticket_id",
+                optional "table", and "ticket" (a Ticket from parse_intent).
+
+        Returns:
+            dict: {"jobs": [...], "tickets": {...}, "metrics": {...}}
+        """
+        seq = itertools.count()
+        job_ids = itertools.count(1)
+        events = []
+        for order in order_stream:
+            heapq.heappush(events, (float(order.get("arrival", 0)), next(seq), "arrive", order))
+
+        tickets = {}
+        jobs = []
+        pending = {station: [] for station in self.stations}
+        free_slots = {station: cfg["slots"] for station, cfg in self.stations.items()}
+        open_batches = {}
+
+        def arrive(order, now):
+            ticket = order["ticket"]
+            ticket_id = str(order.get("ticket_id", len(tickets) + 1))
+            state = _TicketState(ticket_id, order.get("table"), now)
+            tickets[ticket_id] = state
+            longest = 0
+            taste = ticket.taste_profile.key()
+            for item in ticket.ordered_items:
+                station, prep_time = self._item_meta(item.name)
+                capacity = self.stations[station]["batch_size"]
+                batch_key = (station, item.name.lower(), taste, _normalize_notes(item.notes))
+                remaining = item.quantity
+                while remaining > 0:
+                    job = open_batches.get(batch_key) if self.batching else None
+                    if job is None:
+                        job = Job(next(job_ids), station, item.name, batch_key,
+                                  prep_time, capacity, now)
+                        jobs.append(job)
+                        pending[station].append(job)
+                        if self.batching:
+                            open_batches[batch_key] = job
+                    take = min(remaining, job.capacity - job.units)
+                    job.members.append((ticket_id, take))
+                    job.units += take
+                    remaining -= take
+                    if job.units >= job.capacity and open_batches.get(batch_key) is job:
+                        del open_batches[batch_key]
+                    if job not in state.jobs:
+                        state.jobs.append(job)
+                longest = max(longest, prep_time)
+            state.expected_finish = now + longest
+
+        def dispatch(now):
+            for station, queue in pending.items():
+                while queue and free_slots[station] > 0:
+                    ready = [job for job in queue if self._eligible_at(job, tickets) <= now]
+                    if not ready:
+                        wake = min(self._eligible_at(job, tickets) for job in queue)
+                        heapq.heappush(events, (wake, next(seq), "wake", None))
+                        break
+                    job = min(ready, key=lambda j: self._priority(j, tickets))
+                    queue.remove(job)
+                    if open_batches.get(job.batch_key) is job:
+                        del open_batches[job.batch_key]
+                    job.start = now
+                    job.finish = now + job.prep_time
+                    free_slots[station] -= 1
+                    heapq.heappush(events, (job.finish, next(seq), "free", station))
+                    for ticket_id, _ in job.members:
+                        state = tickets[ticket_id]
+                        state.expected_finish = max(state.expected_finish, job.finish)
+
+        while events:
+            now = events[0][0]
+            while events and events[0][0] == now:
+                _, _, kind, data = heapq.heappop(events)
+                if kind == "arrive":
+                    arrive(data, now)
+                elif kind == "free":
+                    free_slots[data] += 1
+            dispatch(now)
+
+        return {
+            "jobs": [job.to_dict() for job in jobs],
+            "tickets": {
+                ticket_id: {
+                    "table": state.table,
+                    "arrival": state.arrival,
+                    "ready": max((job.finish for job in state.jobs), default=state.arrival),
+                    "first_dish": min((job.finish for job in state.jobs), default=state.arrival),
+                }
+                for ticket_id, state in tickets.items()
+            },
+            "metrics": _metrics(jobs, tickets, self.stations),
+        }
+
+
+def _metrics(jobs, tickets, stations):
+    if not tickets:
+        return {"tickets": 0, "jobs": 0}
+    leads = []
+    spreads = []
+    for state in tickets.values():
+        finishes = [job.finish for job in state.jobs]
+        if not finishes:
+            continue
+        leads.append(max(finishes) - state.arrival)
+        spreads.append(max(finishes) - min(finishes))
+    leads.sort()
+    first_arrival = min(state.arrival for state in tickets.values())
+    last_finish = max((job.finish for job in jobs), default=first_arrival)
+    makespan = last_finish - first_arrival
+    busy = {}
+    for job in jobs:
+        busy[job.station] = busy.get(job.station, 0) + job.prep_time
+    return {
+        "tickets": len(tickets),
+        "jobs": len(jobs),
+        "units": sum(job.units for job in jobs),
+        "station_busy_minutes": sum(busy.values()),
+        "makespan_min": round(makespan, 1),
+        "throughput_per_hour": round(len(tickets) / makespan * 60, 1) if makespan else None,
+        "mean_lead_min": round(sum(leads) / len(leads), 1) if leads else None,
+        "p90_lead_min": round(leads[int(0.9 * (len(leads) - 1))], 1) if leads else None,
+        "mean_finish_spread_min": round(sum(spreads) / len(spreads), 1) if spreads else None,
+        "utilization": {
+            station: round(minutes / (stations[station]["slots"] * makespan), 2) if makespan else None
+            for station, minutes in busy.items()
+        },
+    }
+
+
+def simulate(order_stream, stations=None):
+    """
+    Runs a one-ticket-at-a-time FIFO baseline and the batching scheduler on
+    the same order stream and reports both sets of metrics.
+    """
+    orders = list(order_stream)
+    baseline = KitchenScheduler(batching=False, align_finish=False, stations=stations).run(orders)["metrics"]
+    scheduled = KitchenScheduler(batching=True, align_finish=True, stations=stations).run(orders)["metrics"]
+    gain = {}
+    if baseline.get("jobs"):
+        gain["jobs_saved"] = baseline["jobs"] - scheduled["jobs"]
+        gain["busy_minutes_saved"] = baseline["station_busy_minutes"] - scheduled["station_busy_minutes"]
+        if baseline["throughput_per_hour"] and scheduled["throughput_per_hour"]:
+            gain["throughput_ratio"] = round(scheduled["throughput_per_hour"] / baseline["throughput_per_hour"], 2)
+    return {"baseline": baseline, "scheduled": scheduled, "gain": gain}
+
+
+def load_order_stream(path):
+    """
+    Reads a JSONL order stream: {"arrival", "ticket_id", "table", "ticket"} per
+    line. Lines whose ticket fails validation are skipped.
+    """
+    orders = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            order = json.loads(line)
+            try:
+                order["ticket"] = Ticket.from_dict(order["ticket"])
+            except (KeyError, TicketValidationError):
+                continue
+            orders.append(order)
+    return orders
+
+
+def order_stream_from_exchanges(store, model_name=None):
+    """
+    Builds an order stream from recorded LLM exchanges (see src/exchange_store.py).
+    Arrival times are minutes since the first recorded exchange. Speculative
+    exchanges (parses of half-typed orders) are skipped.
+    """
+    from src.intent_parser import try_parse_json
+
+    orders = []
+    first = None
+    for record in store.iter_exchanges(model_name=model_name, speculative=False):
+        parsed, _ = try_parse_json(record["response"])
+        try:
+            ticket = Ticket.from_dict(parsed)
+        except TicketValidationError:
+            continue
+        if not ticket.ordered_items:
+            continue
+        first = record["created_at"] if first is None else first
+        orders.append({
+            "arrival": (record["created_at"] - first) / 60.0,
+            "ticket_id": str(record["id"]),
+            "ticket": ticket,
+        })
+    return orders
+
+
+def synthetic_order_stream(n_tickets=60, minutes=30, seed=7):
+    """Random order stream over the menu, skewed towards popular dishes."""
+    rng = random.Random(seed)
+    names = [item['name'] for item in get_item_index().values()]
+    weights = [1.0 / (rank + 1) for rank in range(len(names))]
+    rng.shuffle(names)
+    spice = ["Low", "Medium", "High"]
+    orders = []
+    for i in range(n_tickets):
+        picks = set(rng.choices(names, weights=weights, k=rng.randint(1, 4)))
+        orders.append({
+            "arrival": round(rng.uniform(0, minutes), 1),
+            "ticket_id": f"T{i + 1}",
+            "table": rng.randint(1, 15),
+            "ticket": Ticket(
+                ordered_items=[OrderedItem(name, rng.randint(1, 2)) for name in picks],
+                dietary_constraints=[],
+                taste_profile=TasteProfile(spice_level=rng.choice(spice), oil_level="Medium", salt_level="Normal"),
+                confirm_with_customer=False,
+                confidence_score=1.0,
+            ),
+        })
+    return orders
+
+
+def format_station_plan(result):
+    """Renders a scheduler result as Markdown, one section per station."""
+    by_station = {}
+    for job in result["jobs"]:
+        by_station.setdefault(job["station"], []).append(job)
+    if not by_station:
+        return "_No tickets in the kitchen._"
+    lines = []
+    for station, station_jobs in by_station.items():
+        lines.append(f"**{station.replace('_', ' ').title()}**")
+        for job in sorted(station_jobs, key=lambda j: j["start"]):
+            tickets = ", ".join(job["tickets"])
+            lines.append(f"- {job['start']:.0f}→{job['finish']:.0f} min: {job['units']}x {job['item']} ({tickets})")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure kitchen throughput with and without batching.")
+    parser.add_argument("--stream", help="JSONL order stream")
+    parser.add_argument("--exchanges", help="Exchange store (SQLite) to build the stream from")
+    parser.add_argument("--synthetic", type=int, default=60, help="Synthetic ticket count if no stream given")
+    parser.add_argument("--minutes", type=float, default=30, help="Synthetic arrival window")
+    args = parser.parse_args()
+
+    if args.stream:
+        stream = load_order_stream(args.stream)
+    elif args.exchanges:
+        from src.exchange_store import ExchangeStore
+        stream = order_stream_from_exchanges(ExchangeStore(args.exchanges))
+    else:
+        stream = synthetic_order_stream(args.synthetic, args.minutes)
+    print(json.dumps(simulate(stream), indent=2))
@@ -0,0 +1,298 @@
+# src/llm_backends.py
+
+"""
+Pluggable LLM backends with latency-based routing.
+
+A backend is any OpenAI-compatible chat completions endpoint: Groq, or a
+local CPU inference server on the LAN (llama.cpp server, vLLM, Ollama's
+OpenAI endpoint, ...). The router keeps a rolling latency and error-rate
+estimate per backend and sends each request to the fastest healthy one.
+Backends whose circuit breaker is open are skipped. With hedging enabled, if
+the first backend hasn't answered after `hedge_delay_s`, the same request is
+also sent to the next backend and the first good answer wins. Each request
+gets its own worker threads, so a slow backend never holds slots other orders
+need; once a winner answers, hedges that haven't been sent yet are cancelled.
+An HTTP request already on the wire can't be aborted: its answer is discarded
+and its thread ends within the backend's timeout.
+
+Configuration (env):
+    LLM_BACKENDS        JSON list of backend dicts, or a path to a JSON file.
+                        Keys: name, url, models, default_model, api_key_env,
+                        uses_request_key, timeout, expected_latency_s.
+    LLM_HEDGE_DELAY_S   Seconds before hedging to a second backend ("off" to disable).
+
+Without LLM_BACKENDS a single Groq backend is configured, using GROQ_API_URL.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from src.circuit_breaker import get_breaker, CLOSED, OPEN
+from src.llm_client import GROQ_API_URL, request_chat_completion, is_circuit_open_error
+
+# Offered in the UI model picker. The default Groq backend passes any model
+# name through unchanged, so newer Groq models work without listing them here.
+GROQ_MODELS = ["llama3-70b-8192", "mixtral-8x7b-32768", "llama3-8b-8192"]
+DEFAULT_HEDGE_DELAY_S = 2.0
+
+# Weight of the newest sample in the rolling averages.
+EWMA_ALPHA = 0.3
+# A backend erroring half the time scores as if it were 3x slower.
+ERROR_PENALTY = 4.0
+# Share of requests sent to the runner-up so a backend that had a bad spell
+# gets re-measured instead of being starved forever.
+DEFAULT_EXPLORE_RATE = 0.05
+
+
+class LLMBackend:
+    """
+    One OpenAI-compatible endpoint.
+
+    Args:
+        name (str): Label used in stats and breaker names.
+        url (str): Full chat completions URL.
+        models (list): Models this backend serves; None means any requested model.
+        default_model (str): Model sent when the requested one isn't in `models`
+            (or always, when `models` is None). Defaults to the first listed model.
+        api_key_env (str): Env var holding this backend's own API key.
+        uses_request_key (bool): Use the key entered in the UI (Groq).
+        timeout (float): HTTP timeout in seconds.
+        expected_latency_s (float): Latency assumed before the first measurement.
+    """
+
+    def __init__(self, name, url, models=None, default_model=None, api_key_env=None,
+                 uses_request_key=False, timeout=30, expected_latency_s=1.0):
+        self.name = name
+        self.url = url
+        self.models = list(models) if models else None
+        self.default_model = default_model or (self.models[0] if self.models else None)
+        self.api_key_env = api_key_env
+        self.uses_request_key = uses_request_key
+        self.timeout = timeout
+        self.expected_latency_s = expected_latency_s
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(**config)
+
+    def resolve_model(self, requested):
+        """The model name actually sent to this backend for a requested model."""
+        if self.models is not None and requested in self.models:
+            return requested
+        return self.default_model or requested
+
+    def breaker_name(self, requested):
+        return f"{self.name}:{self.resolve_model(requested)}"
+
+    def api_key(self, request_key):
+        if self.uses_request_key and request_key:
+            return request_key
+        return os.environ.get(self.api_key_env) if self.api_key_env else None
+
+    def complete(self, request_key, requested_model, messages, temperature=0.1, response_schema=None,
+                 speculative=False):
+        """Returns (content, error, usage, mode) from this backend."""
+        return request_chat_completion(
+            self.url, self.api_key(request_key), self.resolve_model(requested_model), messages,
+            temperature=temperature, response_schema=response_schema,
+            breaker_name=self.breaker_name(requested_model), timeout=self.timeout, speculative=speculative
+        )
+
+
+class BackendRouter:
+    """
+    Routes each request to the fastest healthy backend, with optional hedging.
+
+    Args:
+        backends (list): LLMBackend instances, in preference order for ties.
+        hedge_delay_s (float): Delay before a hedged request; None disables hedging.
+        explore_rate (float): Fraction of requests that try the runner-up first.
+    """
+
+    def __init__(self, backends, hedge_delay_s=DEFAULT_HEDGE_DELAY_S, explore_rate=DEFAULT_EXPLORE_RATE):
+        self.backends = list(backends)
+        self.hedge_delay_s = hedge_delay_s
+        self.explore_rate = explore_rate
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._stats = {}  # breaker name -> {"latency", "error_rate", "calls", "wins"}
+
+    def _record(self, key, latency, ok):
+        with self._lock:
+            stats = self._stats.setdefault(key, {"latency": None, "error_rate": 0.0, "calls": 0, "wins": 0})
+            stats["calls"] += 1
+            stats["error_rate"] += EWMA_ALPHA * ((0.0 if ok else 1.0) - stats["error_rate"])
+            if ok:
+                prev = stats["latency"]
+                stats["latency"] = latency if prev is None else prev + EWMA_ALPHA * (latency - prev)
+
+    def _score(self, backend, model_name):
+        key = backend.breaker_name(model_name)
+        with self._lock:
+            stats = self._stats.get(key)
+            latency = stats["latency"] if stats and stats["latency"] is not None else backend.expected_latency_s
+            error_rate = stats["error_rate"] if stats else 0.0
+        return latency * (1 + ERROR_PENALTY * error_rate)
+
+    def rank(self, model_name):
+        """Backends that can take this request now, best first."""
+        healthy = [b for b in self.backends
+                   if b.resolve_model(model_name) and get_breaker(b.breaker_name(model_name)).state() != OPEN]
+        ranked = sorted(healthy, key=lambda b: self._score(b, model_name))
+        if len(ranked) > 1 and self._rng.random() < self.explore_rate:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def _call(self, backend, api_key, model_name, messages, temperature, response_schema, speculative=False,
+              cancelled=None):
+        if cancelled is not None and cancelled.is_set():
+            return backend, None, "Cancelled: another backend already answered.", None, None
+        started = time.time()
+        content, error, usage, mode = backend.complete(api_key, model_name, messages, temperature, response_schema,
+                                                       speculative)
+        # Only calls that reached the server are measured: a breaker rejection
+        # says nothing new about the backend. Speculative failures (often rate
+        # limits from typing bursts) don't count against it either.
+        if error is None or not (speculative or is_circuit_open_error(error)):
+            self._record(backend.breaker_name(model_name), time.time() - started, error is None)
+        return backend, content, error, usage, mode
+
+    def all_closed(self, model_name):
+        """True if every backend serving this model has a closed circuit breaker."""
+        return all(get_breaker(b.breaker_name(model_name)).state() == CLOSED
+                   for b in self.backends if b.resolve_model(model_name))
+
+    def complete(self, api_key, model_name, messages, temperature=0.1, response_schema=None, speculative=False):
+        """
+        Sends the request to the best backend, hedging or failing over to the
+        next ones as needed.
+
+        Returns:
+            tuple: (content, error, usage, served). `served` is
+            {"backend": "backend:model", "mode": output mode} for the answer
+            that was used, or None on failure.
+        """
+        ranked = self.rank(model_name)
+        if not ranked:
+            return None, f"No healthy LLM backend for {model_name}: all circuits open.", None, None
+
+        pending = set()
+        errors = []
+        next_index = 0
+        cancelled = threading.Event()
+        # One pool per request, sized to its backends, so nothing ever queues behind another order.
+        executor = ThreadPoolExecutor(max_workers=len(ranked), thread_name_prefix="llm-backend")
+
+        def launch():
+            nonlocal next_index
+            backend = ranked[next_index]
+            next_index += 1
+            pending.add(executor.submit(self._call, backend, api_key, model_name, messages, temperature,
+                                        response_schema, speculative, cancelled))
+
+        try:
+            launch()
+            while pending:
+                can_hedge = self.hedge_delay_s is not None and next_index < len(ranked)
+                done, _ = wait(pending, timeout=self.hedge_delay_s if can_hedge else None,
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    # Slow first answer: hedge to the next backend, keep waiting on both.
+                    launch()
+                    continue
+                for future in done:
+                    pending.discard(future)
+                    backend, content, error, usage, mode = future.result()
+                    if error is None:
+                        served = {"backend": backend.breaker_name(model_name), "mode": mode}
+                        with self._lock:
+                            self._stats[served["backend"]]["wins"] += 1
+                        return content, None, usage, served
+                    errors.append(f"{backend.name}: {error}")
+                if not pending and next_index < len(ranked):
+                    # Failed outright: fail over to the next backend.
+                    launch()
+            return None, " | ".join(errors), None, None
+        finally:
+            # Losing hedges that haven't sent yet are skipped; in-flight ones finish unobserved.
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def probe(self, api_key, model_name, messages):
+        """Calls every backend directly. Returns {backend name: error or None}."""
+        with ThreadPoolExecutor(max_workers=len(self.backends), thread_name_prefix="llm-probe") as executor:
+            futures = {b.name: executor.submit(self._call, b, api_key, model_name, messages, 0, None)
+                       for b in self.backends}
+            return {name: future.result()[2] for name, future in futures.items()}
+
+    def available_models(self):
+        """
+        Models that can be requested, in config order. A backend without a
+        model list offers its default model, or the Groq models if it passes
+        any requested name through.
+        """
+        models = []
+        for backend in self.backends:
+            offered = backend.models or ([backend.default_model] if backend.default_model else GROQ_MODELS)
+            for model in offered:
+                if model not in models:
+                    models.append(model)
+        return models
+
+    def snapshot(self):
+        """Rolling latency, error rate, calls and hedge/failover wins per backend:model."""
+        with self._lock:
+            return {key: {
+                "latency_s": round(stats["latency"], 3) if stats["latency"] is not None else None,
+                "error_rate": round(stats["error_rate"], 3),
+                "calls": stats["calls"],
+                "wins": stats["wins"],
+            } for key, stats in self._stats.items()}
+
+
+def default_backends():
+    return [LLMBackend("groq", GROQ_API_URL, api_key_env="GROQ_API_KEY", uses_request_key=True)]
+
+
+def load_backends(config=None):
+    """Builds backends from LLM_BACKENDS (JSON text or file path), else Groq only."""
+    config = config if config is not None else os.environ.get("LLM_BACKENDS", "").strip()
+    if not config:
+        return default_backends()
+    if not config.startswith("["):
+        with open(config, encoding="utf-8") as f:
+            config = f.read()
+    return [LLMBackend.from_dict(entry) for entry in json.loads(config)]
+
+
+def _hedge_delay_from_env():
+    value = os.environ.get("LLM_HEDGE_DELAY_S", "").strip().lower()
+    if not value:
+        return DEFAULT_HEDGE_DELAY_S
+    if value in ("off", "none", "0"):
+        return None
+    return float(value)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Returns the shared router, built from the environment on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = BackendRouter(load_backends(), hedge_delay_s=_hedge_delay_from_env())
+        return _router
+
+
+def set_router(router):
+    """Replaces the shared router (used by benchmarks and local setups)."""
+    global _router
+    with _router_lock:
+        _router = router
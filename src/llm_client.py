@@ -2,57 +2,317 @@
 
 import requests
 import json
+import os
+import threading
 import time
+from src.circuit_breaker import get_breaker
+from src.exchange_store import get_exchange_mode, get_exchange_store
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 
-def call_groq_api(api_key, model_name, messages, temperature=0.1):
+# How output structure is enforced (env LLM_STRUCTURED_OUTPUT):
+#   json_object - ask for any JSON object, rely on parsing/validation (default)
+#   json_schema - send the schema as response_format so the server constrains output.
+#                 Strict mode is tried first (with a strict-compatible copy of the
+#                 schema, see `to_strict_schema`); models that reject it get the
+#                 non-strict schema from then on.
+#   tool        - send the schema as a forced function/tool call
+STRUCTURED_OUTPUT_MODES = ("json_object", "json_schema", "tool")
+STRICT_SCHEMA_MODE = "json_schema_strict"
+TOOL_NAME = "submit_kitchen_ticket"
+# Prefix of the error returned when the breaker rejects a call before it is sent.
+CIRCUIT_OPEN_ERROR = "Circuit open"
+
+# model -> modes the server has rejected; those models skip them from then on.
+_unsupported_modes = {}
+_capability_lock = threading.Lock()
+
+def get_structured_output_mode():
+    mode = os.environ.get("LLM_STRUCTURED_OUTPUT", "json_object").lower()
+    return mode if mode in STRUCTURED_OUTPUT_MODES else "json_object"
+
+def get_structured_output_capabilities():
+    """Returns {model: [rejected modes]} learned so far."""
+    with _capability_lock:
+        return {model: sorted(modes) for model, modes in _unsupported_modes.items()}
+
+def requested_output_mode(response_schema):
+    """The configured mode for a call, before any per-model fallback."""
+    return get_structured_output_mode() if response_schema else "json_object"
+
+def _modes_for(model_name, response_schema):
+    """Modes to try for this call, best first; json_object is always the last resort."""
+    requested = requested_output_mode(response_schema)
+    candidates = [STRICT_SCHEMA_MODE, "json_schema"] if requested == "json_schema" else [requested]
+    with _capability_lock:
+        rejected = _unsupported_modes.get(model_name, set())
+    modes = [mode for mode in candidates if mode not in rejected]
+    if requested != "json_object":
+        modes.append("json_object")
+    return modes
+
+def _mark_unsupported(model_name, mode):
+    with _capability_lock:
+        _unsupported_modes.setdefault(model_name, set()).add(mode)
+
+def is_capability_error(response, mode=None):
+    """True if a 400 says the model doesn't support the requested output mode."""
+    if response.status_code != 400:
+        return False
+    body = response.text.lower()
+    # json_validate_failed means the model tried and failed, not that the mode is unsupported.
+    if "json_validate_failed" in body:
+        return False
+    # Only the server's explicit "not supported" answer counts; other 400s
+    # that merely mention the schema (e.g. a bad schema) are not capability gaps.
+    if not any(phrase in body for phrase in ("not support", "unsupported")):
+        return False
+    return any(k in body for k in ("response_format", "json_schema", "tool", "strict"))
+
+def is_validation_failure(response):
+    """True if the server's constrained generation failed its own schema check."""
+    return response.status_code == 400 and "json_validate_failed" in response.text.lower()
+
+def to_strict_schema(schema):
     """
-    Calls the Groq API to get a chat completion.
+    Returns a copy of a JSON schema that strict structured output accepts.
     
-    Args:
-        api_key (str): The Groq API key.
-        model_name (str): The model to use (e.g., 'llama3-70b-8192').
-        messages (list): List of message dicts (role, content).
-        temperature (float): Sampling temp, low for deterministic output.
-        
-    Returns:
-        dict: The parsed JSON response content if successful, or None.
-        str: Raw text content if JSON parsing fails but request succeeded.
-        str: Error message if request failed.
+    Strict mode requires every object to list all its properties as required
+    and to forbid extra ones, so optional properties become nullable instead.
+    The Ticket model treats null like an absent field.
     """
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
+    schema = dict(schema)
+    if schema.get("type") == "object" and "properties" in schema:
+        required = set(schema.get("required", []))
+        properties = {}
+        for name, prop in schema["properties"].items():
+            prop = to_strict_schema(prop)
+            if name not in required:
+                prop["type"] = [prop["type"], "null"]
+                if "enum" in prop:
+                    prop["enum"] = list(prop["enum"]) + [None]
+            properties[name] = prop
+        schema["properties"] = properties
+        schema["required"] = list(properties)
+        schema["additionalProperties"] = False
+    elif schema.get("type") == "array" and "items" in schema:
+        schema["items"] = to_strict_schema(schema["items"])
+    return schema
+
+def build_payload(model_name, messages, temperature, mode, response_schema=None):
+    """Builds the chat completion payload for the given structured output mode."""
     payload = {
         "model": model_name,
         "messages": messages,
         "temperature": temperature,
-        "response_format": {"type": "json_object"} # Force JSON mode if model supports it
     }
+    if mode in ("json_schema", STRICT_SCHEMA_MODE):
+        strict = mode == STRICT_SCHEMA_MODE
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "kitchen_ticket",
+                "schema": to_strict_schema(response_schema) if strict else response_schema,
+                "strict": strict
+            }
+        }
+    elif mode == "tool":
+        payload["tools"] = [{
+            "type": "function",
+            "function": {
+                "name": TOOL_NAME,
+                "description": "Submit the kitchen-ready ticket for this order.",
+                "parameters": response_schema
+            }
+        }]
+        payload["tool_choice"] = {"type": "function", "function": {"name": TOOL_NAME}}
+    else:
+        payload["response_format"] = {"type": "json_object"} # Force JSON mode if model supports it
+    return payload
+
+def extract_content(data, mode):
+    """
+    Pulls the JSON text out of a completion, from the tool call in tool mode.
+    Returns None if the model sent neither content nor a tool call.
+    """
+    message = data['choices'][0]['message']
+    if mode == "tool" and message.get('tool_calls'):
+        return message['tool_calls'][0]['function']['arguments']
+    return message.get('content')
+
+def request_chat_completion(url, api_key, model_name, messages, temperature=0.1,
+                            response_schema=None, breaker_name=None, timeout=30, speculative=False):
+    """
+    Sends one chat completion to an OpenAI-compatible endpoint.
+    
+    Goes through the circuit breaker named `breaker_name` (defaults to the
+    model name). If the server rejects the structured output mode, that is
+    remembered per breaker name and the call is resent in the next mode
+    (non-strict schema, then plain JSON). If constrained generation fails the
+    server's own schema check (json_validate_failed), the failed generation is
+    returned as the content so the parser's retry, which stays in the same
+    constrained mode, can ask the model to fix it. Only if the server sent no
+    failed generation is the call resent once in plain JSON mode.
     
+    Returns:
+        tuple: (content, error, usage, mode). On success error is None and
+        mode is the structured output mode that produced the content; on
+        failure content, usage and mode are None.
+    """
+    breaker_name = breaker_name or model_name
+    breaker = get_breaker(breaker_name)
+    if not breaker.allow_request():
+        return None, f"{CIRCUIT_OPEN_ERROR} for {breaker_name}: backend recently unhealthy, skipping call.", None, None
+    
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    
+    start_time = time.time()
     try:
-        start_time = time.time()
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-        latency = time.time() - start_time
-        
-        # Log latency (in a real app, use logger)
-        print(f"[DEBUG] LLM Latency: {latency:.2f}s")
-        
-        response.raise_for_status()
-        
-        data = response.json()
-        content = data['choices'][0]['message']['content']
-        
-        return content, None  # Success, no error
+        modes = _modes_for(breaker_name, response_schema)
+        while modes:
+            mode = modes.pop(0)
+            payload = build_payload(model_name, messages, temperature, mode, response_schema)
+            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            if mode != "json_object" and is_capability_error(response, mode):
+                print(f"[DEBUG] {breaker_name} does not support {mode} output, falling back.")
+                _mark_unsupported(breaker_name, mode)
+                continue
+            if is_validation_failure(response):
+                failed_generation = response.json().get('error', {}).get('failed_generation')
+                if failed_generation:
+                    # Hand the invalid output to the parser, whose retry asks the model to fix it.
+                    breaker.record_success(time.time() - start_time)
+                    return failed_generation, None, None, mode
+                if mode != "json_object":
+                    print(f"[DEBUG] {breaker_name} failed {mode} validation, resending in json_object mode.")
+                    modes = ["json_object"]
+                    continue
+            latency = time.time() - start_time
+            
+            # Log latency (in a real app, use logger)
+            print(f"[DEBUG] LLM Latency: {latency:.2f}s ({breaker_name}, {mode})")
+            
+            response.raise_for_status()
+            
+            data = response.json()
+            content = extract_content(data, mode)
+            
+            breaker.record_success(latency)
+            if content is None:
+                # The backend answered; the model just produced nothing usable.
+                return None, f"Empty completion from {breaker_name} ({mode}): no content or tool call.", None, None
+            return content, None, data.get('usage'), mode  # Success, no error
         
     except requests.exceptions.RequestException as e:
         error_msg = f"API Request Failed: {str(e)}"
         if hasattr(e, 'response') and e.response is not None:
             error_msg += f" | Response: {e.response.text}"
-        return None, error_msg
+        if is_backend_failure(e):
+            _record_failure(breaker, time.time() - start_time, speculative)
+        else:
+            breaker.record_ignored()
+        return None, error_msg, None, None
     except Exception as e:
-        return None, f"Unexpected Error: {str(e)}"
+        _record_failure(breaker, time.time() - start_time, speculative)
+        return None, f"Unexpected Error: {str(e)}", None, None
+
+def _record_failure(breaker, latency, speculative):
+    # Speculative calls fire on every typing pause; a burst of them hitting a
+    # rate limit mustn't open the breaker for real orders.
+    if speculative:
+        breaker.record_ignored()
+    else:
+        breaker.record_failure(latency)
+
+def call_groq_api(api_key, model_name, messages, temperature=0.1, response_schema=None, speculative=False):
+    """
+    Gets a chat completion from the best available LLM backend.
+    
+    Despite the name, this now goes through the backend router
+    (see src/llm_backends.py), which by default holds only Groq.
+    
+    Args:
+        api_key (str): The Groq API key (used for backends that take the UI key).
+        model_name (str): The model to use (e.g., 'llama3-70b-8192').
+        messages (list): List of message dicts (role, content).
+        temperature (float): Sampling temp, low for deterministic output.
+        response_schema (dict): JSON schema for the output. Used for native
+            structured output when LLM_STRUCTURED_OUTPUT selects it.
+        speculative (bool): Call made while the customer is still typing. Its
+            failures don't trip the circuit breaker and its exchange is
+            recorded with the speculative tag.
+        
+    Returns:
+        str: Raw response content if successful, else None.
+        str: Error message if request failed, else None.
+    
+    Backends whose circuit breaker is open are skipped; if none is healthy
+    the call fails immediately so the caller can fall back.
+    """
+    from src.llm_backends import get_router
+    
+    router = get_router()
+    
+    # Record/replay store (see src/exchange_store.py). Recordings are keyed by
+    # the backend and the *requested* output mode. That comes from config only,
+    # so replay doesn't depend on capabilities learned earlier in this process.
+    exchange_mode = get_exchange_mode()
+    store = get_exchange_store()
+    output_mode = requested_output_mode(response_schema)
+    if exchange_mode in ("replay", "cache"):
+        for backend in router.backends:
+            recorded = store.lookup(model_name, messages, temperature,
+                                    backend=backend.breaker_name(model_name), mode=output_mode)
+            if recorded is not None:
+                return recorded, None
+        if exchange_mode == "replay":
+            return None, "Replay miss: no recorded exchange for this request."
+    
+    start_time = time.time()
+    content, error, usage, served = router.complete(api_key, model_name, messages, temperature, response_schema,
+                                                    speculative=speculative)
+    if error is None and store is not None:
+        try:
+            store.record(model_name, messages, content, latency=time.time() - start_time,
+                         usage=usage, temperature=temperature,
+                         backend=served["backend"], mode=output_mode, speculative=speculative)
+        except Exception as e:
+            # A full disk shouldn't cost the customer their order.
+            print(f"[DEBUG] Exchange record failed: {e}")
+    return content, error
+
+def is_circuit_open_error(error):
+    """True if the call was rejected by its circuit breaker and never reached the server."""
+    return bool(error) and error.startswith(CIRCUIT_OPEN_ERROR)
+
+def is_backend_failure(exc):
+    """
+    True if a request error says the backend is unhealthy.
+    
+    Timeouts, connection errors, 5xx and 429 count; other 4xx responses
+    (bad key, bad request) are the caller's problem and don't trip the breaker.
+    """
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
+
+def probe_model(api_key, model_name):
+    """
+    Sends a tiny health-check completion to every configured backend.
+    
+    Returns:
+        tuple: (ok, message) suitable for display in the UI; ok if any backend answered.
+    """
+    from src.llm_backends import get_router
+    
+    messages = [
+        {"role": "system", "content": "Reply with the JSON object {\"ok\": true}."},
+        {"role": "user", "content": "ping"}
+    ]
+    results = get_router().probe(api_key, model_name, messages)
+    ok = any(error is None for error in results.values())
+    message = "; ".join(f"{name}: {'ok' if error is None else error}" for name, error in results.items())
+    return ok, message
@@ -0,0 +1,183 @@
+# src/request_coalescer.py
+
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same thing at the same moment (a whole table
+submitting the same order, or a tablet double-submit), only the first caller
+does the work. Everyone else waits on that in-flight call and receives the
+same result. Nothing is cached once the call completes.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+
+
+def make_order_key(user_text, structured_inputs, model_name, *extra, api_key=None):
+    """
+    Builds a normalized key for an order so equivalent requests coalesce.
+
+    Whitespace and case differences in the free text are ignored, and the
+    preference dict is serialized with sorted keys. Only a hash of the API key
+    goes into the key, so callers with different keys never share a result
+    (one bad or rate-limited key must not hand its fallback to everyone).
+    """
+    normalized_text = " ".join((user_text or "").lower().split())
+    prefs = json.dumps(structured_inputs or {}, sort_keys=True, default=str)
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return json.dumps([normalized_text, prefs, model_name, key_hash] + list(extra))
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it."""
+
+    def __init__(self, tag=None):
+        self.tag = tag
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # Finished without a result; waiters must retry.
+        self.waiters = 0
+        self.async_waiters = []  # (loop, future) for coroutines waiting on this call
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    Works for plain threads (`do`) and for asyncio code (`do_async`). Both
+    paths share the same in-flight table, so a thread and a coroutine asking
+    for the same key also coalesce.
+
+    Calls can carry a `tag` (e.g. "speculative"). Tagged calls are counted
+    under "<tag>_calls", "<tag>_executed" and "<tag>_coalesced" in `stats()`.
+    A caller that joins a call with a different tag is counted under
+    "joined_<tag>" (prefixed by its own tag), not as a coalesced duplicate.
+    """
+
+    def __init__(self, copy_results=True):
+        # Waiters get a deep copy so one caller mutating its ticket can't
+        # change what the others see.
+        self.copy_results = copy_results
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def _count(self, name):
+        self._stats[name] = self._stats.get(name, 0) + 1
+
+    def _join(self, key, tag=None):
+        """Returns (call, is_leader) for the key."""
+        prefix = f"{tag}_" if tag else ""
+        with self._lock:
+            self._count(prefix + "calls")
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                if call.tag == tag:
+                    self._count(prefix + "coalesced")
+                else:
+                    self._count(prefix + "joined_" + (call.tag or "untagged"))
+                return call, False
+            call = _Call(tag)
+            self._calls[key] = call
+            self._count(prefix + "executed")
+            return call, True
+
+    def _finish(self, key, call, result, error, abandoned=False):
+        call.result = result
+        call.error = error
+        call.abandoned = abandoned
+        with self._lock:
+            self._calls.pop(key, None)
+            call.done.set()
+            async_waiters, call.async_waiters = call.async_waiters, []
+        for loop, future in async_waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # The waiter's loop has closed; nobody is left to wake.
+
+    def _finish_from_future(self, key, call, future):
+        if future.cancelled():
+            self._finish(key, call, None, None, abandoned=True)
+        elif future.exception() is not None:
+            self._finish(key, call, None, future.exception())
+        else:
+            self._finish(key, call, future.result(), None)
+
+    def _deliver(self, call, is_leader):
+        if call.error is not None:
+            raise call.error
+        if is_leader or not self.copy_results:
+            return call.result
+        return copy.deepcopy(call.result)
+
+    def do(self, key, fn, *args, tag=None, **kwargs):
+        """Runs fn(*args, **kwargs) unless an identical call is already running."""
+        while True:
+            call, is_leader = self._join(key, tag)
+            if is_leader:
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    self._finish(key, call, None, e)
+                    raise
+                except BaseException:
+                    # Interrupted, not failed: waiters retry rather than inherit it.
+                    self._finish(key, call, None, None, abandoned=True)
+                    raise
+                self._finish(key, call, result, None)
+                return result
+            call.done.wait()
+            if not call.abandoned:
+                return self._deliver(call, is_leader)
+
+    async def do_async(self, key, fn, *args, tag=None, **kwargs):
+        """
+        Async variant of `do`.
+
+        `fn` may be a coroutine function or a blocking function; blocking
+        functions run in the default executor so the event loop stays free.
+
+        The work runs as its own task, so cancelling the leader (a client
+        disconnecting) only cancels the leader's wait: the call completes and
+        the waiters still get its result. If the work itself is cancelled,
+        waiters retry and one of them runs the call again.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            call, is_leader = self._join(key, tag)
+            if is_leader:
+                if asyncio.iscoroutinefunction(fn):
+                    work = asyncio.ensure_future(fn(*args, **kwargs))
+                else:
+                    work = loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+                work.add_done_callback(lambda done: self._finish_from_future(key, call, done))
+                return await asyncio.shield(work)
+            # Wait on a future the leader resolves, so waiters don't each hold
+            # an executor thread for the whole call.
+            future = loop.create_future()
+            with self._lock:
+                finished = call.done.is_set()
+                if not finished:
+                    call.async_waiters.append((loop, future))
+            if not finished:
+                await future
+            if not call.abandoned:
+                return self._deliver(call, is_leader)
+
+    def stats(self):
+        """Returns counters: total calls, calls actually executed, calls saved (per tag)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
@@ -0,0 +1,184 @@
+# src/speculation.py
+
+"""
+Speculative pre-parsing while the customer is still typing.
+
+Every change to the order text or preference controls triggers a cheap local
+parse (menu keyword match plus allergy warnings) for an instant preview. Once
+the inputs have been stable for a short debounce period, a speculative
+`parse_intent` call is started in the background (opt-in, see app.py). When "Send to Chef" is
+clicked with the same inputs, the finished ticket is reused. If the call is
+still in flight, the click joins it through the request coalescer. Edits
+(including a new API key) invalidate older speculation, so stale results are
+never served. Fallback tickets are never kept: Send always retries the LLM.
+
+Speculation only runs while every backend's circuit breaker is closed, and its
+calls are marked speculative: their failures don't trip the breaker and their
+exchanges are tagged so the kitchen simulator skips them.
+"""
+
+import threading
+from collections import OrderedDict
+
+from src.intent_parser import is_fallback_ticket, parse_intent
+from src.llm_backends import get_router
+from src.request_coalescer import make_order_key
+from src.tenants import DEFAULT_TENANT, TenantError, get_tenant_artifacts
+
+# Don't spend an LLM call on a couple of characters.
+MIN_SPECULATION_CHARS = 8
+# Long enough that a pause between words doesn't fire a call.
+DEFAULT_DEBOUNCE_SECONDS = 1.5
+
+
+def local_preview(user_text, structured_inputs, tenant_id=DEFAULT_TENANT):
+    """
+    Instant, network-free parse of the order so far against the tenant's menu.
+
+    Returns:
+        dict: {"items": [names mentioned], "warnings": [allergy clashes]};
+        both empty if the restaurant's menu is unavailable.
+    """
+    try:
+        artifacts = get_tenant_artifacts(tenant_id)
+    except TenantError:
+        return {"items": [], "warnings": []}
+    positions = artifacts.match_items(user_text)
+    allergies = structured_inputs.get('allergies') or []
+
+    warnings = []
+    for allergy in allergies:
+        mask = artifacts.conflict_mask([allergy])
+        for position in positions:
+            if mask >> position & 1:
+                warnings.append(f"{artifacts.items[position]['name']} contains {allergy.lower()}")
+    return {"items": [artifacts.items[position]['name'] for position in positions], "warnings": warnings}
+
+
+def format_preview(preview, speculating=False):
+    """Renders a local preview as a short Markdown line for the order panel."""
+    if not preview["items"]:
+        text = "_No menu items recognised yet._"
+    else:
+        text = "**Heard so far:** " + ", ".join(preview["items"])
+    for warning in preview["warnings"]:
+        text += f"\n\n⚠️ {warning}"
+    if speculating:
+        text += "\n\n_Preparing your ticket..._"
+    return text
+
+
+class OrderSpeculator:
+    """
+    Per-session speculative parser.
+
+    Args:
+        debounce_seconds (float): How long inputs must stay unchanged before the
+            speculative LLM call starts.
+        speculate_llm (bool): If False, only the local preview runs.
+        parse_fn (callable): Parser to call, defaults to `parse_intent`. Must
+            accept a `speculative` keyword.
+    """
+
+    def __init__(self, debounce_seconds=DEFAULT_DEBOUNCE_SECONDS, speculate_llm=True, parse_fn=parse_intent):
+        self.debounce_seconds = debounce_seconds
+        self.speculate_llm = speculate_llm
+        self.parse_fn = parse_fn
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._timer = None
+        self._result = None  # (key, ticket) from the latest speculation
+        self.stats = {"speculations": 0, "cancelled": 0, "skipped_unhealthy": 0, "hits": 0, "misses": 0}
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self.stats["cancelled"] += 1
+
+    def update(self, user_text, structured_inputs, api_key, model_name, tenant_id=DEFAULT_TENANT):
+        """
+        Called on every input change. Returns the local preview and (re)arms
+        the debounced speculative call.
+        """
+        preview = local_preview(user_text, structured_inputs, tenant_id)
+        key = make_order_key(user_text, structured_inputs, model_name, tenant_id, api_key=api_key)
+        with self._lock:
+            if self._result is not None and self._result[0] == key:
+                return preview, False
+            self._generation += 1
+            self._result = None
+            self._cancel_timer()
+            speculating = (self.speculate_llm and bool(api_key)
+                           and len((user_text or "").strip()) >= MIN_SPECULATION_CHARS)
+            if speculating and not get_router().all_closed(model_name):
+                # Backend already struggling: save the quota for real orders.
+                speculating = False
+                self.stats["skipped_unhealthy"] += 1
+            if speculating:
+                self._timer = threading.Timer(
+                    self.debounce_seconds, self._speculate,
+                    args=(self._generation, key, user_text, structured_inputs, api_key, model_name, tenant_id)
+                )
+                self._timer.daemon = True
+                self._timer.start()
+        return preview, speculating
+
+    def _speculate(self, generation, key, user_text, structured_inputs, api_key, model_name, tenant_id):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._timer = None
+            if not get_router().all_closed(model_name):
+                self.stats["skipped_unhealthy"] += 1
+                return
+            self.stats["speculations"] += 1
+        ticket = self.parse_fn(user_text, structured_inputs, api_key, model_name, tenant_id, speculative=True)
+        # A failed call (bad key, open breaker, outage) isn't worth reusing:
+        # Send should try the LLM again.
+        if is_fallback_ticket(ticket):
+            return
+        with self._lock:
+            # Inputs changed while we were waiting on the LLM: drop it.
+            if generation == self._generation:
+                self._result = (key, ticket)
+
+    def resolve(self, user_text, structured_inputs, api_key, model_name, tenant_id=DEFAULT_TENANT):
+        """
+        Called on "Send to Chef". Reuses the speculative ticket when the inputs
+        match, otherwise parses now (joining any in-flight identical call).
+        """
+        key = make_order_key(user_text, structured_inputs, model_name, tenant_id, api_key=api_key)
+        with self._lock:
+            if self._result is not None and self._result[0] == key:
+                self.stats["hits"] += 1
+                return self._result[1]
+            self.stats["misses"] += 1
+            self._cancel_timer()
+        return self.parse_fn(user_text, structured_inputs, api_key, model_name, tenant_id)
+
+    def cancel(self):
+        """Drops any pending or in-flight speculation."""
+        with self._lock:
+            self._generation += 1
+            self._result = None
+            self._cancel_timer()
+
+
+_speculators = OrderedDict()
+_speculators_lock = threading.Lock()
+MAX_SESSIONS = 256
+
+
+def get_speculator(session_id, **kwargs):
+    """Returns the speculator for a UI session, keeping the most recent sessions only."""
+    with _speculators_lock:
+        speculator = _speculators.get(session_id)
+        if speculator is None:
+            speculator = OrderSpeculator(**kwargs)
+            _speculators[session_id] = speculator
+        _speculators.move_to_end(session_id)
+        while len(_speculators) > MAX_SESSIONS:
+            _, evicted = _speculators.popitem(last=False)
+            evicted.cancel()
+        return speculator
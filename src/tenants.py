@@ -0,0 +1,335 @@
+# src/tenants.py
+
+"""
+Multi-restaurant tenancy.
+
+Each outlet (tenant) has its own menu. Everything derived from a menu (the
+LLM system prompt, name/search indexes, allergen conflict masks and the
+display Markdown) is built lazily on first use and kept in a memory-bounded
+LRU. One process can therefore serve many outlets while only the busy ones
+stay resident.
+
+Menus come from:
+- the built-in MENU, as tenant "default",
+- `register_tenant_menu()` at runtime,
+- `<TENANT_MENU_DIR>/<tenant_id>.json` on disk (env, default "menus"), read
+  only when the tenant's artifacts are (re)built.
+
+Menus are validated before use; a missing or malformed menu raises a
+`TenantError` subclass, which the parser turns into a fallback ticket.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from src.menu_data import MENU, get_all_items_flat
+from src.request_coalescer import SingleFlight
+
+DEFAULT_TENANT = "default"
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+_TENANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# UI allergy option -> menu tag that signals it.
+ALLERGY_TAGS = {"Nuts": "nuts", "Dairy": "dairy", "Gluten": "gluten"}
+
+
+class TenantError(Exception):
+    """Base class for tenant lookup and menu errors."""
+
+
+class UnknownTenantError(TenantError, KeyError):
+    """Raised for a tenant id with no registered or on-disk menu."""
+
+    def __str__(self):
+        return f"unknown restaurant {self.args[0]!r}"
+
+
+class InvalidMenuError(TenantError, ValueError):
+    """Raised for a menu that can't be read or doesn't have the MENU shape."""
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_menu(menu):
+    """
+    Checks a menu has the shape of MENU: category -> list of items, each with
+    a name, price, description and list of tags (station and prep_time are
+    optional).
+
+    Raises:
+        InvalidMenuError: Describing the first problem found.
+    """
+    if not isinstance(menu, dict) or not menu:
+        raise InvalidMenuError("menu must be a non-empty object of category -> items")
+    for category, items in menu.items():
+        if not isinstance(items, list):
+            raise InvalidMenuError(f"{category}: items must be a list")
+        for i, item in enumerate(items):
+            where = f"{category}[{i}]"
+            if not isinstance(item, dict):
+                raise InvalidMenuError(f"{where}: item must be an object")
+            if not isinstance(item.get('name'), str) or not item['name'].strip():
+                raise InvalidMenuError(f"{where}: name must be a non-empty string")
+            if not _is_number(item.get('price')):
+                raise InvalidMenuError(f"{where}: price must be a number")
+            if not isinstance(item.get('description'), str):
+                raise InvalidMenuError(f"{where}: description must be a string")
+            tags = item.get('tags')
+            if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+                raise InvalidMenuError(f"{where}: tags must be a list of strings")
+            if 'station' in item and not isinstance(item['station'], str):
+                raise InvalidMenuError(f"{where}: station must be a string")
+            if 'prep_time' in item and not (_is_number(item['prep_time']) and item['prep_time'] > 0):
+                raise InvalidMenuError(f"{where}: prep_time must be a positive number")
+
+
+def build_menu_markdown(menu):
+    """Formats a menu for the UI Accordion."""
+    display_text = ""
+    for category, items in menu.items():
+        display_text += f"\n### {category}\n"
+        for item in items:
+            tags = ", ".join(item['tags'])
+            display_text += f"- **{item['name']}** (₹{item['price']}): {item['description']} _[{tags}]_\n"
+    return display_text
+
+
+def _deep_sizeof(obj, seen=None):
+    """Approximate retained size of an object graph, in bytes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+class TenantArtifacts:
+    """
+    Everything derived from one tenant's menu. Built once, read-only after.
+
+    Attributes:
+        menu (dict): The raw menu.
+        items (list): Flat item list; positions are the bits in `tag_masks`.
+        item_index (dict): Lower-cased name -> item (for the kitchen scheduler).
+        name_patterns (list): (lower-cased name, position), longest names first.
+        tag_masks (dict): Tag -> bitmask of item positions carrying that tag.
+        system_prompt (str): LLM system prompt for this menu.
+        menu_markdown (str): Menu rendered for the UI.
+        nbytes (int): Approximate memory freed by evicting this object. A menu
+            the registry keeps anyway (built-in or registered) isn't counted.
+    """
+
+    __slots__ = ("tenant_id", "menu", "items", "item_index", "name_patterns", "tag_masks",
+                 "system_prompt", "menu_markdown", "nbytes")
+
+    def __init__(self, tenant_id, menu, owns_menu=True):
+        # Imported here: intent_parser imports this module.
+        from src.intent_parser import generate_system_prompt
+
+        self.tenant_id = tenant_id
+        self.menu = menu
+        self.items = get_all_items_flat(menu)
+        self.item_index = {item['name'].lower(): item for item in self.items}
+        self.name_patterns = sorted(((item['name'].lower(), i) for i, item in enumerate(self.items)),
+                                    key=lambda pattern: -len(pattern[0]))
+        self.tag_masks = {}
+        for i, item in enumerate(self.items):
+            for tag in item.get('tags', []):
+                self.tag_masks[tag] = self.tag_masks.get(tag, 0) | (1 << i)
+        self.system_prompt = generate_system_prompt(menu)
+        self.menu_markdown = build_menu_markdown(menu)
+        self.nbytes = 0
+        seen = set()
+        if not owns_menu:
+            _deep_sizeof(menu, seen)  # Marks the menu's objects as already counted.
+        self.nbytes = _deep_sizeof(self, seen)
+
+    def match_items(self, text):
+        """
+        Item positions whose names appear in the text. Longer names win, so
+        "Mango Lassi" doesn't also match "Lassi".
+        """
+        lower_text = " ".join((text or "").lower().split())
+        matched = []
+        for name, position in self.name_patterns:
+            if name in lower_text:
+                matched.append(position)
+                lower_text = lower_text.replace(name, " ")
+        return matched
+
+    def conflict_mask(self, allergies):
+        """Bitmask of items that clash with any of the given UI allergy options."""
+        mask = 0
+        for allergy in allergies or []:
+            tag = ALLERGY_TAGS.get(allergy)
+            if tag:
+                mask |= self.tag_masks.get(tag, 0)
+        return mask
+
+
+class TenantRegistry:
+    """
+    Menu sources plus an LRU of built artifacts, bounded by total bytes.
+
+    Args:
+        menu_dir (str): Directory with `<tenant_id>.json` menus.
+        max_bytes (int): Memory budget for cached artifacts. The most recently
+            used tenant is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, menu_dir="menus", max_bytes=DEFAULT_MAX_BYTES):
+        self.menu_dir = menu_dir
+        self.max_bytes = max_bytes
+        self._menus = {DEFAULT_TENANT: MENU}
+        # Bumped by register(); a build started before the bump is discarded.
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # tenant_id -> TenantArtifacts
+        self._bytes = 0
+        self._builds = SingleFlight(copy_results=False)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _menu_path(self, tenant_id):
+        return os.path.join(self.menu_dir, f"{tenant_id}.json")
+
+    def register(self, tenant_id, menu):
+        """
+        Adds or replaces a tenant's menu; its cached artifacts are dropped.
+
+        Raises:
+            ValueError: For an invalid tenant id or menu (InvalidMenuError).
+        """
+        if not _TENANT_ID_RE.match(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        validate_menu(menu)
+        with self._lock:
+            self._menus[tenant_id] = menu
+            self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            self._drop(tenant_id)
+
+    def _drop(self, tenant_id):
+        artifacts = self._cache.pop(tenant_id, None)
+        if artifacts is not None:
+            self._bytes -= artifacts.nbytes
+
+    def list_tenants(self):
+        """Registered tenants plus those with a menu file on disk, sorted."""
+        tenants = set(self._menus)
+        if os.path.isdir(self.menu_dir):
+            tenants.update(name[:-5] for name in os.listdir(self.menu_dir)
+                           if name.endswith(".json") and _TENANT_ID_RE.match(name[:-5]))
+        return sorted(tenants, key=lambda t: (t != DEFAULT_TENANT, t))
+
+    def _load_menu(self, tenant_id):
+        """Returns (menu, owned by the registry, version) for a tenant."""
+        if not _TENANT_ID_RE.match(tenant_id or ""):
+            raise UnknownTenantError(tenant_id)
+        with self._lock:
+            menu = self._menus.get(tenant_id)
+            version = self._versions.get(tenant_id, 0)
+        if menu is not None:
+            return menu, True, version
+        path = self._menu_path(tenant_id)
+        if not os.path.exists(path):
+            raise UnknownTenantError(tenant_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                menu = json.load(f)
+        except (OSError, ValueError) as e:
+            raise InvalidMenuError(f"{path}: {e}") from e
+        try:
+            validate_menu(menu)
+        except InvalidMenuError as e:
+            raise InvalidMenuError(f"{path}: {e}") from e
+        return menu, False, version
+
+    def _build(self, tenant_id):
+        while True:
+            menu, registered, version = self._load_menu(tenant_id)
+            artifacts = TenantArtifacts(tenant_id, menu, owns_menu=not registered)
+            with self._lock:
+                if self._versions.get(tenant_id, 0) != version:
+                    continue  # register() replaced the menu mid-build; build the new one.
+                self._drop(tenant_id)
+                self._cache[tenant_id] = artifacts
+                self._bytes += artifacts.nbytes
+                while self._bytes > self.max_bytes and len(self._cache) > 1:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+                    self._stats["evictions"] += 1
+            return artifacts
+
+    def get(self, tenant_id=DEFAULT_TENANT):
+        """
+        Returns the tenant's artifacts, building them on a miss.
+
+        Raises:
+            UnknownTenantError: No registered or on-disk menu for the tenant.
+            InvalidMenuError: The menu file can't be read or is malformed.
+        """
+        with self._lock:
+            artifacts = self._cache.get(tenant_id)
+            if artifacts is not None:
+                self._cache.move_to_end(tenant_id)
+                self._stats["hits"] += 1
+                return artifacts
+            self._stats["misses"] += 1
+        # Concurrent misses for one tenant share a single build.
+        return self._builds.do(tenant_id, self._build, tenant_id)
+
+    def stats(self):
+        """Cache counters, total bytes and per-tenant bytes of resident artifacts."""
+        with self._lock:
+            return {
+                **self._stats,
+                "cached_tenants": len(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "tenants": {tenant_id: a.nbytes for tenant_id, a in self._cache.items()},
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the shared registry, configured from TENANT_MENU_DIR / TENANT_CACHE_MAX_BYTES."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TenantRegistry(
+                menu_dir=os.environ.get("TENANT_MENU_DIR", "menus"),
+                max_bytes=int(os.environ.get("TENANT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+            )
+        return _registry
+
+
+def get_tenant_artifacts(tenant_id=DEFAULT_TENANT):
+    return get_registry().get(tenant_id)
+
+
+def register_tenant_menu(tenant_id, menu):
+    get_registry().register(tenant_id, menu)
+
+
+def list_tenants():
+    return get_registry().list_tenants()
+
+
+def get_tenant_stats():
+    return get_registry().stats()
@@ -0,0 +1,213 @@
+# src/ticket_model.py
+
+"""
+Typed kitchen ticket model.
+
+A `Ticket` is built once from the LLM's JSON (or by the fallback logic) and
+then shared by the parser, the chef view renderer and the kitchen scheduler.
+`Ticket.from_dict` is the single place where ticket JSON is validated; once a
+Ticket exists its fields can be read directly, with no `.get()` defaults.
+
+The classes use `__slots__` to keep per-ticket memory low when many tickets are
+held in queues or stores. Treat tickets as read-only after construction.
+"""
+
+import json
+
+from src.intent_schema import INTENT_SCHEMA
+
+_TASTE_SCHEMA = INTENT_SCHEMA["properties"]["taste_profile"]["properties"]
+TASTE_LEVELS = {field: tuple(spec["enum"]) for field, spec in _TASTE_SCHEMA.items()}
+
+
+class TicketValidationError(ValueError):
+    """Raised when ticket JSON doesn't match the intent schema."""
+
+
+def _require_type(value, types, field):
+    if not isinstance(value, types) or isinstance(value, bool) and bool not in _as_tuple(types):
+        raise TicketValidationError(f"{field} has wrong type: {type(value).__name__}")
+    return value
+
+
+def _as_tuple(types):
+    return types if isinstance(types, tuple) else (types,)
+
+
+def _optional_str(data, field):
+    value = data.get(field)
+    if value is None:
+        return None
+    return _require_type(value, str, field)
+
+
+def _str_list(data, field):
+    # null is treated like an absent list, as models often send it for "none".
+    value = data.get(field)
+    if value is None:
+        return []
+    _require_type(value, list, field)
+    return [_require_type(v, str, f"{field}[]") for v in value]
+
+
+class TasteProfile:
+    """
+    Spice, oil, sweetness and salt levels; each is one of TASTE_LEVELS or None.
+
+    Values outside the enum ("Mild", "Medium-High") become None rather than
+    rejecting the whole ticket: the field is optional and the chef still gets
+    the order.
+    """
+
+    __slots__ = ("spice_level", "oil_level", "sweetness", "salt_level")
+
+    def __init__(self, spice_level=None, oil_level=None, sweetness=None, salt_level=None):
+        self.spice_level = spice_level
+        self.oil_level = oil_level
+        self.sweetness = sweetness
+        self.salt_level = salt_level
+
+    @classmethod
+    def from_dict(cls, data):
+        if data is None:
+            return cls()
+        _require_type(data, dict, "taste_profile")
+        values = {}
+        for field, levels in TASTE_LEVELS.items():
+            value = data.get(field)
+            # Accept case drift ("medium"); anything else outside the enum is dropped.
+            values[field] = next((level for level in levels if str(value).lower() == level.lower()), None)
+        return cls(**values)
+
+    def key(self):
+        """Tuple used to decide whether two items can be cooked together."""
+        return (self.spice_level, self.oil_level, self.sweetness, self.salt_level)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+
+
+class OrderedItem:
+    """One line on the ticket: menu item name, quantity and optional notes."""
+
+    __slots__ = ("name", "quantity", "notes")
+
+    def __init__(self, name, quantity=1, notes=None):
+        self.name = name
+        self.quantity = quantity
+        self.notes = notes
+
+    @classmethod
+    def from_dict(cls, data):
+        _require_type(data, dict, "ordered_items[]")
+        if "name" not in data or "quantity" not in data:
+            raise TicketValidationError("ordered_items[] requires name and quantity")
+        name = _require_type(data["name"], str, "ordered_items[].name")
+        quantity = data["quantity"]
+        if isinstance(quantity, float) and quantity.is_integer():
+            quantity = int(quantity)
+        elif isinstance(quantity, str) and quantity.strip().isdigit():
+            quantity = int(quantity)
+        _require_type(quantity, int, "ordered_items[].quantity")
+        if quantity < 1:
+            raise TicketValidationError(f"ordered_items[].quantity must be >= 1, got {quantity}")
+        return cls(name, quantity, _optional_str(data, "notes"))
+
+    def to_dict(self):
+        item = {"name": self.name, "quantity": self.quantity}
+        if self.notes is not None:
+            item["notes"] = self.notes
+        return item
+
+
+class Ticket:
+    """A validated kitchen ticket. See INTENT_SCHEMA for field meanings."""
+
+    __slots__ = (
+        "ordered_items", "dietary_constraints", "taste_profile", "cooking_notes",
+        "confirm_with_customer", "clarification_question", "confidence_score",
+        "ambiguity_reasons", "conflict_flag", "conflict_message", "_json",
+    )
+
+    def __init__(self, ordered_items, dietary_constraints, taste_profile, confirm_with_customer,
+                 confidence_score, cooking_notes=None, clarification_question=None,
+                 ambiguity_reasons=None, conflict_flag=False, conflict_message=None):
+        self.ordered_items = ordered_items
+        self.dietary_constraints = dietary_constraints
+        self.taste_profile = taste_profile
+        self.cooking_notes = cooking_notes
+        self.confirm_with_customer = confirm_with_customer
+        self.clarification_question = clarification_question
+        self.confidence_score = confidence_score
+        self.ambiguity_reasons = ambiguity_reasons or []
+        self.conflict_flag = conflict_flag
+        self.conflict_message = conflict_message
+        self._json = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Validates ticket JSON against the intent schema and builds a Ticket.
+
+        Raises:
+            TicketValidationError: On missing required fields, wrong types or
+                out-of-range values.
+        """
+        _require_type(data, dict, "ticket")
+        for field in INTENT_SCHEMA["required"]:
+            if field not in data:
+                raise TicketValidationError(f"Missing required field: {field}")
+
+        items = _require_type(data["ordered_items"], list, "ordered_items")
+        confidence = _require_type(data["confidence_score"], (int, float), "confidence_score")
+        if not 0 <= confidence <= 1:
+            raise TicketValidationError(f"confidence_score must be between 0 and 1, got {confidence}")
+
+        return cls(
+            ordered_items=[OrderedItem.from_dict(item) for item in items],
+            dietary_constraints=_str_list(data, "dietary_constraints"),
+            taste_profile=TasteProfile.from_dict(data["taste_profile"]),
+            confirm_with_customer=_require_type(data["confirm_with_customer"], bool, "confirm_with_customer"),
+            confidence_score=float(confidence),
+            cooking_notes=_optional_str(data, "cooking_notes"),
+            clarification_question=_optional_str(data, "clarification_question"),
+            ambiguity_reasons=_str_list(data, "ambiguity_reasons"),
+            conflict_flag=_require_type(data.get("conflict_flag") or False, bool, "conflict_flag"),
+            conflict_message=_optional_str(data, "conflict_message"),
+        )
+
+    def to_dict(self):
+        """
+        Returns the ticket as schema-shaped JSON data.
+
+        A new dict every call: coalesced callers share one Ticket, so a cached
+        dict mutated by one caller would change what the others see.
+        """
+        data = {
+            "ordered_items": [item.to_dict() for item in self.ordered_items],
+            "dietary_constraints": list(self.dietary_constraints),
+            "taste_profile": self.taste_profile.to_dict(),
+            "confirm_with_customer": self.confirm_with_customer,
+            "confidence_score": self.confidence_score,
+            "ambiguity_reasons": list(self.ambiguity_reasons),
+            "conflict_flag": self.conflict_flag,
+        }
+        for field in ("cooking_notes", "clarification_question", "conflict_message"):
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = value
+        return data
+
+    def to_json(self):
+        """Compact JSON for the ticket. Built once, then reused (strings are immutable)."""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict(), separators=(",", ":"), ensure_ascii=False)
+        return self._json
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def __repr__(self):
+        items = ", ".join(f"{item.quantity}x {item.name}" for item in self.ordered_items)
+        return f"Ticket([{items}], confidence={self.confidence_score})"